@@ -0,0 +1,110 @@
+"""
+Move-generation lookup tables, built once at import and shared by every GameState in the process.
+
+Mailbox tables are indexed [row][col] and hold (row, col) tuples, so generators can walk them without
+bounds checks or multiplications. Bitboard tables are indexed by square = row*8 + col (a8 = 0, h1 = 63).
+"""
+
+# same order as the direction tuples used by the mailbox generators: orthogonal then diagonal
+RAY_DIRECTIONS = ((-1,0),(0,-1),(1,0),(0,1),(-1,-1),(-1,1),(1,-1),(1,1))
+KNIGHT_OFFSETS = ((-2,-1),(-2,1),(-1,-2),(-1,2),(1,-2),(1,2),(2,-1),(2,1))
+
+
+# ---------- mailbox tables ----------
+def _buildStepTargets(offsets):
+    return [[tuple((r + dr, c + dc) for dr, dc in offsets if 0 <= r + dr < 8 and 0 <= c + dc < 8)
+             for c in range(8)] for r in range(8)]
+
+
+def _buildRays(r, c):
+    rays = []
+    for dr, dc in RAY_DIRECTIONS:
+        ray = []
+        end_row, end_col = r + dr, c + dc
+        while 0 <= end_row < 8 and 0 <= end_col < 8:
+            ray.append((end_row, end_col))
+            end_row, end_col = end_row + dr, end_col + dc
+        rays.append(tuple(ray))
+    return tuple(rays)
+
+
+KNIGHT_TARGETS = _buildStepTargets(KNIGHT_OFFSETS)
+KING_TARGETS = _buildStepTargets(RAY_DIRECTIONS)
+# squares attacked by a pawn of the given color standing on (row, col)
+PAWN_TARGETS = {'w': _buildStepTargets(((-1,-1),(-1,1))), 'b': _buildStepTargets(((1,-1),(1,1)))}
+# RAYS[row][col][j]: squares along RAY_DIRECTIONS[j], nearest first
+RAYS = [[_buildRays(r, c) for c in range(8)] for r in range(8)]
+
+
+# ---------- bitboard tables ----------
+FULL_BB = (1 << 64) - 1
+FILE_A_BB = sum(1 << (r*8) for r in range(8))
+FILE_H_BB = FILE_A_BB << 7
+PROMOTION_RANKS_BB = 0xFF | (0xFF << 56)  # rows 0 and 7
+
+
+def _buildStepMasks(offsets):
+    masks = []
+    for sq in range(64):
+        r, c = divmod(sq, 8)
+        mask = 0
+        for dr, dc in offsets:
+            if 0 <= r + dr < 8 and 0 <= c + dc < 8:
+                mask |= 1 << ((r + dr)*8 + c + dc)
+        masks.append(mask)
+    return masks
+
+
+def _buildRayMasks():
+    rays = []
+    for dr, dc in RAY_DIRECTIONS:
+        masks = []
+        for sq in range(64):
+            r, c = divmod(sq, 8)
+            mask = 0
+            r, c = r + dr, c + dc
+            while 0 <= r < 8 and 0 <= c < 8:
+                mask |= 1 << (r*8 + c)
+                r, c = r + dr, c + dc
+            masks.append(mask)
+        rays.append(masks)
+    return rays
+
+
+KNIGHT_BB = _buildStepMasks(KNIGHT_OFFSETS)
+KING_BB = _buildStepMasks(RAY_DIRECTIONS)
+# squares attacked by a pawn of the given color standing on sq
+PAWN_ATTACK_BB = {'w': _buildStepMasks(((-1,-1),(-1,1))), 'b': _buildStepMasks(((1,-1),(1,1)))}
+RAY_BB = _buildRayMasks()
+# rays running towards higher square indexes find their nearest blocker with the lowest set bit
+RAY_POSITIVE = tuple(dr*8 + dc > 0 for dr, dc in RAY_DIRECTIONS)
+# BETWEEN_BB[a][b]: squares strictly between a and b; LINE_BB[a][b]: the whole line through both (0 if not aligned)
+BETWEEN_BB = [[0]*64 for _ in range(64)]
+LINE_BB = [[0]*64 for _ in range(64)]
+for _j in range(8):
+    _back = (2, 3, 0, 1, 7, 6, 5, 4)[_j]  # index of the opposite direction
+    for _a in range(64):
+        _ray = RAY_BB[_j][_a]
+        while _ray:
+            _lsb = _ray & -_ray
+            _b = _lsb.bit_length() - 1
+            _ray ^= _lsb
+            BETWEEN_BB[_a][_b] = RAY_BB[_j][_a] & RAY_BB[_back][_b]
+            LINE_BB[_a][_b] = RAY_BB[_j][_a] | RAY_BB[_back][_a] | (1 << _a)
+SQ_TO_RC = tuple(divmod(sq, 8) for sq in range(64))
+
+
+def slidingAttacks(sq, occupied, first, last):
+    """Attack set of a slider on sq using rays first..last-1 of RAY_DIRECTIONS, stopping at the first blocker."""
+    attacks = 0
+    for j in range(first, last):
+        ray = RAY_BB[j][sq]
+        blockers = ray & occupied
+        if blockers:
+            if RAY_POSITIVE[j]:
+                blocker = (blockers & -blockers).bit_length() - 1
+            else:
+                blocker = blockers.bit_length() - 1
+            ray ^= RAY_BB[j][blocker]
+        attacks |= ray
+    return attacks
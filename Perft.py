@@ -0,0 +1,108 @@
+"""
+Perft - counts the leaf nodes of the legal move tree to a fixed depth.
+
+Used to check move generation against known counts after a change, and to measure its raw speed.
+Usage (run as a module from the directory that contains the Chess package, as the code imports
+`from Chess import ...`):
+    python -m Chess.Perft                          # start position, depth 4
+    python -m Chess.Perft --fen "<FEN>" --depth 3 --divide
+    python -m Chess.Perft --suite --depth 3        # all reference positions
+    python -m Chess.Perft --backend bitboard       # BitboardGameState instead of GameState
+"""
+import argparse
+import time
+from Chess import ChessEngine
+
+# (name, fen, expected node counts for depth 1, 2, 3, ...)
+PERFT_SUITE = [
+    ("start", ChessEngine.START_FEN,
+     [20, 400, 8902, 197281, 4865609]),
+    ("kiwipete", "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+     [48, 2039, 97862, 4085603]),
+    ("position3", "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+     [14, 191, 2812, 43238, 674624]),
+    ("position4", "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+     [6, 264, 9467, 422333]),
+    ("position5", "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8",
+     [44, 1486, 62379, 2103487]),
+    ("position6", "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+     [46, 2079, 89890, 3894594]),
+]
+
+BACKENDS = {'bitboard': ChessEngine.BitboardGameState, 'mailbox': ChessEngine.GameState}
+
+
+def perft(gs, depth):
+    """Number of leaf nodes `depth` plies below the current position (moves at the last ply are counted, not made)."""
+    if depth == 0:
+        return 1
+    moves = gs.getValidMoves()
+    if depth == 1:
+        return len(moves)
+    nodes = 0
+    for move in moves:
+        gs.makeMove(move)
+        nodes += perft(gs, depth - 1)
+        gs.undoMove()
+    return nodes
+
+
+def divide(gs, depth):
+    """Perft split by root move: a list of (notation, nodes), for locating a move-generation bug."""
+    results = []
+    for move in gs.getValidMoves():
+        gs.makeMove(move)
+        results.append((move.get_chess_notation(), perft(gs, depth - 1)))
+        gs.undoMove()
+    return results
+
+
+def runPerft(gs, depth, show_divide=False):
+    """Run perft on gs, print the node count and nodes/second, and return the node count."""
+    start = time.perf_counter()
+    if show_divide:
+        nodes = 0
+        for notation, count in divide(gs, depth):
+            print("%s: %d" % (notation, count))
+            nodes += count
+    else:
+        nodes = perft(gs, depth)
+    elapsed = time.perf_counter() - start
+    nps = nodes / elapsed if elapsed > 0 else float('inf')
+    print("depth %d: %d nodes in %.3fs (%.0f nodes/s)" % (depth, nodes, elapsed, nps))
+    return nodes
+
+
+def runSuite(depth, backend=ChessEngine.GameState):
+    """Check every PERFT_SUITE position up to `depth` (capped at its known counts); return True if all match."""
+    all_ok = True
+    for name, fen, expected in PERFT_SUITE:
+        for d in range(1, min(depth, len(expected)) + 1):
+            start = time.perf_counter()
+            nodes = perft(backend.fromFen(fen), d)
+            elapsed = time.perf_counter() - start
+            ok = nodes == expected[d-1]
+            all_ok = all_ok and ok
+            print("%-10s depth %d: %9d expected %9d  %s  (%.0f nodes/s)" % (
+                name, d, nodes, expected[d-1], "ok" if ok else "MISMATCH", nodes / elapsed if elapsed > 0 else 0))
+    return all_ok
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Count legal move tree leaf nodes (perft).")
+    parser.add_argument("--fen", default=ChessEngine.START_FEN, help="position to search (default: start position)")
+    parser.add_argument("--depth", type=int, default=4, help="depth in plies (default: 4)")
+    parser.add_argument("--divide", action="store_true", help="print the node count below each root move")
+    parser.add_argument("--suite", action="store_true", help="check all reference positions up to --depth")
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default='mailbox', help="GameState implementation")
+    args = parser.parse_args(argv)
+
+    backend = BACKENDS[args.backend]
+    if args.suite:
+        return 0 if runSuite(args.depth, backend) else 1
+    runPerft(backend.fromFen(args.fen), args.depth, args.divide)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
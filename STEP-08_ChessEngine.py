@@ -1,5 +1,59 @@
 # ChessEngine.py
-import copy
+import random
+from Chess.ChessTables import (RAYS, KNIGHT_TARGETS, KING_TARGETS, PAWN_TARGETS, RAY_DIRECTIONS,
+                               FULL_BB, FILE_A_BB, FILE_H_BB, PROMOTION_RANKS_BB, KNIGHT_BB, KING_BB,
+                               PAWN_ATTACK_BB, BETWEEN_BB, LINE_BB, SQ_TO_RC, slidingAttacks)
+
+# ---------- Zobrist keys (fixed seed so hashes are stable between runs and processes) ----------
+_zobristRandom = random.Random(20240601)
+ZOBRIST_PIECE = {color + piece: [_zobristRandom.getrandbits(64) for _ in range(64)]
+                 for color in "wb" for piece in "pNBRQK"}
+ZOBRIST_CASTLING = [_zobristRandom.getrandbits(64) for _ in range(4)]  # wks, wqs, bks, bqs
+ZOBRIST_EP_FILE = [_zobristRandom.getrandbits(64) for _ in range(8)]
+ZOBRIST_BLACK_TO_MOVE = _zobristRandom.getrandbits(64)
+
+# ---------- castling rights as a 4-bit mask ----------
+WKS, WQS, BKS, BQS = 1, 2, 4, 8
+ALL_CASTLING_RIGHTS = WKS | WQS | BKS | BQS
+# rights that survive a move starting or ending on each square: moving a king or rook from its home
+# square, or capturing a rook on it, clears the matching rights with a single AND
+CASTLING_KEEP = [ALL_CASTLING_RIGHTS]*64
+CASTLING_KEEP[7*8 + 4] &= ~(WKS | WQS)  # e1
+CASTLING_KEEP[7*8 + 7] &= ~WKS          # h1
+CASTLING_KEEP[7*8 + 0] &= ~WQS          # a1
+CASTLING_KEEP[0*8 + 4] &= ~(BKS | BQS)  # e8
+CASTLING_KEEP[0*8 + 7] &= ~BKS          # h8
+CASTLING_KEEP[0*8 + 0] &= ~BQS          # a8
+# Zobrist key of every castling mask
+ZOBRIST_CASTLING_RIGHTS = [0]*16
+for _mask in range(16):
+    for _bit in range(4):
+        if _mask >> _bit & 1:
+            ZOBRIST_CASTLING_RIGHTS[_mask] ^= ZOBRIST_CASTLING[_bit]
+
+
+START_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+
+# RAYS direction range (first, last) each sliding piece moves along: orthogonal 0..3, diagonal 4..7
+SLIDER_RAYS = {'R': (0, 4), 'B': (4, 8), 'Q': (0, 8)}
+
+# piece values used to order captures, most valuable victim / least valuable attacker
+MVV_LVA_VALUES = {'p': 1, 'N': 3, 'B': 3, 'R': 5, 'Q': 9, 'K': 10, '-': 0}
+
+
+# piece values for static exchange evaluation; the king outweighs any exchange, so it never ends up
+# capturing into a square the opponent still attacks
+SEE_VALUES = dict(MVV_LVA_VALUES, K=100)
+SEE_ORDER = "pNBRQK"  # least valuable attacker first
+
+
+def mvvLvaScore(move):
+    """Ordering score of a capture or promotion: victim value first, then cheaper attacker, plus promotion gain."""
+    score = MVV_LVA_VALUES[move.piece_captured[1]] * 16 - MVV_LVA_VALUES[move.piece_moved[1]]
+    if move.isPawnPromotion:
+        score += MVV_LVA_VALUES[move.promotionPiece] * 16
+    return score
+
 
 class GameState():
     def __init__(self):
@@ -17,52 +71,212 @@ class GameState():
         self.moveFunction = {'p':self.getPawnMoves, 'R':self.getRookMoves, 'K':self.getKingMoves,
                              'Q':self.getQueenMoves, 'B':self.getBishopMoves, 'N':self.getKnightMoves}
         self.whiteToMove = True
-        self.moveLog = []
         self.whiteKingLocation = (7, 4)
         self.blackKingLocation = (0, 4)
         self.checkMate = False
         self.staleMate = False   # keep your original name
         self.pins = []
         self.checks = []
+        self.pinDirections = {}
+        # which kinds of moves the per-piece generators emit (see generateLegalMoves)
+        self.genCaptures = True
+        self.genQuiets = True
         self.enpassantPossible = ()  # (row, col) where en-passant is possible
-        # CastlingRights(wks, wqs, bks, bqs)
-        self.currentCastlingRights = CastlingRights(True, True, True, True)
-        self.castlingRightsLogs = [copy.deepcopy(self.currentCastlingRights)]
-
-        # position history for repetition detection (store a compact key)
-        self.positionLog = [self._boardKey()]
-
-    # ---------- helper: board key for repetition ----------
-    def _boardKey(self):
-        """
-        Returns a compact immutable representation of the current position including:
-        - board piece placement
-        - side to move
-        - castling rights
-        - enpassant square
-        This is sufficient for threefold repetition detection.
-        """
-        board_repr = tuple(tuple(row) for row in self.board)
-        side = 'w' if self.whiteToMove else 'b'
-        cr = (self.currentCastlingRights.wks, self.currentCastlingRights.wqs,
-              self.currentCastlingRights.bks, self.currentCastlingRights.bqs)
-        ep = self.enpassantPossible if self.enpassantPossible else None
-        return (board_repr, side, cr, ep)
+        self.castlingRights = ALL_CASTLING_RIGHTS  # mask of WKS, WQS, BKS, BQS
+        # plies since the last irreversible move (pawn move or capture)
+        self.halfmoveClock = 0
+        # ply number of the starting position (0 = white's first move), for FEN move numbers
+        self.startPly = 0
+        self._buildPieceSquares()
+        self._resetHistory()
+
+    def _buildPieceSquares(self):
+        """
+        Per-color sets of occupied (row, col) squares, kept up to date by makeMove/undoMove so move
+        generation and evaluation visit only the pieces instead of all 64 squares.
+        """
+        self.pieceSquares = {'w': set(), 'b': set()}
+        for r in range(8):
+            for c in range(8):
+                piece = self.board[r][c]
+                if piece != "--":
+                    self.pieceSquares[piece[0]].add((r, c))
+                    if piece == "wK":
+                        self.whiteKingLocation = (r, c)
+                    elif piece == "bK":
+                        self.blackKingLocation = (r, c)
+
+    def _resetHistory(self):
+        """Start an empty game history (move log, hash, repetition table) at the current position."""
+        self.moveLog = []
+        # the position the history starts from, so the game can be replayed elsewhere (getSnapshot)
+        self.startFen = self.getFen()
+        # attack bitmaps of the current position per color, filled on demand by attackMap()
+        self.attackMaps = {}
+        # 64-bit Zobrist key of the current position, updated incrementally by makeMove/undoMove
+        self.zobristKey = self.computeZobristKey()
+        # position history for repetition detection (one Zobrist key per ply)
+        self.positionLog = [self.zobristKey]
+        # one record per ply of the state makeMove cannot recompute on undo:
+        # (castlingRights, enpassantPossible, halfmoveClock, zobristKey)
+        self.undoLog = []
+        # occurrences of each Zobrist key since the last irreversible move; positions before it can
+        # never repeat, so each irreversible move stacks the current table and starts an empty one
+        self.repetitionCounts = {self.zobristKey: 1}
+        self.repetitionStack = []
+
+    # ---------- FEN import / export ----------
+    @classmethod
+    def fromFen(cls, fen):
+        """Return a new GameState set up from a FEN string."""
+        gs = cls()
+        gs.loadFen(fen)
+        return gs
+
+    def loadFen(self, fen):
+        """Replace the current position with the one described by `fen` and clear the game history."""
+        fields = fen.split()
+        ranks = fields[0].split('/') if fields else []
+        if len(ranks) != 8:
+            raise ValueError("Invalid FEN (expected 8 ranks): " + fen)
+        board = []
+        for rank in ranks:
+            row = []
+            for ch in rank:
+                if ch.isdigit():
+                    row.extend(["--"] * int(ch))
+                elif ch.upper() in "PNBRQK":
+                    row.append(('w' if ch.isupper() else 'b') + ('p' if ch.upper() == 'P' else ch.upper()))
+                else:
+                    raise ValueError("Invalid FEN piece %r: %s" % (ch, fen))
+            if len(row) != 8:
+                raise ValueError("Invalid FEN (rank without 8 squares): " + fen)
+            board.append(row)
+
+        self.board = board
+        self._buildPieceSquares()
+        self.whiteToMove = len(fields) < 2 or fields[1] == 'w'
+        castling = fields[2] if len(fields) > 2 else '-'
+        self.castlingRights = 0
+        for letter, right in (('K', WKS), ('Q', WQS), ('k', BKS), ('q', BQS)):
+            if letter in castling:
+                self.castlingRights |= right
+        ep = fields[3] if len(fields) > 3 else '-'
+        self.enpassantPossible = () if ep == '-' else (Move.ranks_to_rows[ep[1]], Move.files_to_cols[ep[0]])
+        self.halfmoveClock = int(fields[4]) if len(fields) > 4 else 0
+        fullmove = int(fields[5]) if len(fields) > 5 else 1
+        self.startPly = 2*(fullmove - 1) + (0 if self.whiteToMove else 1)
+        self.checkMate = False
+        self.staleMate = False
+        self._resetHistory()
+
+    def getSnapshot(self):
+        """
+        (starting FEN, move_ids played since): a small picklable form of the game, history included,
+        for handing the position to another process. Rebuild it with fromSnapshot.
+        """
+        return self.startFen, tuple(move.move_id for move in self.moveLog)
+
+    @classmethod
+    def fromSnapshot(cls, snapshot):
+        """Return a new GameState replaying a getSnapshot() result."""
+        startFen, moveIds = snapshot
+        gs = cls.fromFen(startFen)
+        for move_id in moveIds:
+            gs.makeMove(Move.fromId(move_id, gs.board))
+        return gs
+
+    def getFen(self):
+        """Return the FEN string of the current position."""
+        ranks = []
+        for row in self.board:
+            rank = ""
+            empty = 0
+            for piece in row:
+                if piece == "--":
+                    empty += 1
+                    continue
+                if empty:
+                    rank += str(empty)
+                    empty = 0
+                letter = 'P' if piece[1] == 'p' else piece[1]
+                rank += letter if piece[0] == 'w' else letter.lower()
+            if empty:
+                rank += str(empty)
+            ranks.append(rank)
+        castling = "".join(letter for letter, right in (('K', WKS), ('Q', WQS), ('k', BKS), ('q', BQS))
+                           if self.castlingRights & right) or '-'
+        ep = Move.cols_to_files[self.enpassantPossible[1]] + Move.rows_to_ranks[self.enpassantPossible[0]] \
+            if self.enpassantPossible else '-'
+        fullmove = (self.startPly + len(self.moveLog)) // 2 + 1
+        return "%s %s %s %s %d %d" % ("/".join(ranks), 'w' if self.whiteToMove else 'b', castling, ep,
+                                      self.halfmoveClock, fullmove)
+
+    # ---------- helper: Zobrist key for repetition and search tables ----------
+    def computeZobristKey(self):
+        """
+        Compute the Zobrist key of the current position from scratch:
+        piece placement, side to move, castling rights and en-passant file.
+        makeMove/undoMove keep self.zobristKey equal to this without recomputing it.
+        """
+        key = 0
+        for r in range(8):
+            for c in range(8):
+                piece = self.board[r][c]
+                if piece != "--":
+                    key ^= ZOBRIST_PIECE[piece][r*8 + c]
+        key ^= ZOBRIST_CASTLING_RIGHTS[self.castlingRights]
+        if self.enpassantPossible:
+            key ^= ZOBRIST_EP_FILE[self.enpassantPossible[1]]
+        if not self.whiteToMove:
+            key ^= ZOBRIST_BLACK_TO_MOVE
+        return key
+
+    @property
+    def currentCastlingRights(self):
+        """Read-only CastlingRights view of the castling mask."""
+        rights = self.castlingRights
+        return CastlingRights(bool(rights & WKS), bool(rights & WQS), bool(rights & BKS), bool(rights & BQS))
 
     def isThreefoldRepetition(self):
         """
         Return True if the current position has occurred three or more times in the game history.
-        Uses the positionLog snapshots appended after each makeMove/undoMove.
+        O(1) lookup in repetitionCounts, cheap enough for the search to call at every node.
         """
-        key = self._boardKey()
-        return self.positionLog.count(key) >= 3
+        return self.repetitionCounts.get(self.zobristKey, 0) >= 3
+
+    @staticmethod
+    def isIrreversible(move):
+        return move.piece_moved[1] == 'p' or move.piece_captured != "--"
 
     # --------------- make / undo moves ----------------
     def makeMove(self, move):
+        # save what undoMove cannot recompute from the move itself
+        self.undoLog.append((self.castlingRights, self.enpassantPossible, self.halfmoveClock, self.zobristKey))
+
+        start_sq = move.start_row*8 + move.start_col
+        end_sq = move.end_row*8 + move.end_col
+        key = self.zobristKey ^ ZOBRIST_PIECE[move.piece_moved][start_sq] ^ ZOBRIST_BLACK_TO_MOVE
+        if move.piece_captured != "--" and not move.isEnPassantMove:
+            key ^= ZOBRIST_PIECE[move.piece_captured][end_sq]
+        if self.enpassantPossible:
+            key ^= ZOBRIST_EP_FILE[self.enpassantPossible[1]]
+
         # move piece
         self.board[move.end_row][move.end_col] = move.piece_moved
         self.board[move.start_row][move.start_col] = "--"
         self.moveLog.append(move)
+        self.attackMaps = {}
+
+        # update piece lists
+        own_squares = self.pieceSquares[move.piece_moved[0]]
+        own_squares.remove((move.start_row, move.start_col))
+        own_squares.add((move.end_row, move.end_col))
+        if move.piece_captured != "--":
+            if move.isEnPassantMove:
+                self.pieceSquares[move.piece_captured[0]].remove((move.start_row, move.end_col))
+            else:
+                self.pieceSquares[move.piece_captured[0]].remove((move.end_row, move.end_col))
 
         # update king location
         if move.piece_moved == "wK":
@@ -73,17 +287,26 @@ class GameState():
         # handle castling rook movement
         if move.isCastleMove:
             # king-side
+            rook_key = ZOBRIST_PIECE[move.piece_moved[0] + 'R']
+            row_sq = move.end_row*8
             if move.end_col == 6:
                 self.board[move.end_row][5] = self.board[move.end_row][7]
                 self.board[move.end_row][7] = "--"
+                key ^= rook_key[row_sq + 7] ^ rook_key[row_sq + 5]
+                own_squares.remove((move.end_row, 7))
+                own_squares.add((move.end_row, 5))
             # queen-side
             elif move.end_col == 2:
                 self.board[move.end_row][3] = self.board[move.end_row][0]
                 self.board[move.end_row][0] = "--"
+                key ^= rook_key[row_sq] ^ rook_key[row_sq + 3]
+                own_squares.remove((move.end_row, 0))
+                own_squares.add((move.end_row, 3))
 
         # pawn promotion
         if move.isPawnPromotion:
-            self.board[move.end_row][move.end_col] = move.piece_moved[0] + 'Q'
+            self.board[move.end_row][move.end_col] = move.piece_moved[0] + move.promotionPiece
+        key ^= ZOBRIST_PIECE[self.board[move.end_row][move.end_col]][end_sq]
 
         # en-passant capture handling
         if move.isEnPassantMove:
@@ -92,31 +315,54 @@ class GameState():
                 self.board[move.end_row + 1][move.end_col] = "--"
             else:
                 self.board[move.end_row - 1][move.end_col] = "--"
+            key ^= ZOBRIST_PIECE[move.piece_captured][move.start_row*8 + move.end_col]
 
         # update en-passant possibility
         if move.piece_moved[1] == 'p' and abs(move.start_row - move.end_row) == 2:
             self.enpassantPossible = ((move.start_row + move.end_row)//2, move.start_col)
+            key ^= ZOBRIST_EP_FILE[move.start_col]
         else:
             self.enpassantPossible = ()
 
-        # update castling rights and save snapshot
-        self.updateCastlingRights(move)
-        self.castlingRightsLogs.append(copy.deepcopy(self.currentCastlingRights))
+        # update castling rights
+        rights = self.castlingRights
+        if rights:
+            self.updateCastlingRights(move)
+            key ^= ZOBRIST_CASTLING_RIGHTS[rights] ^ ZOBRIST_CASTLING_RIGHTS[self.castlingRights]
 
         # switch turn
         self.whiteToMove = not self.whiteToMove
 
         # append position key for repetition detection
-        self.positionLog.append(self._boardKey())
+        self.zobristKey = key
+        self.positionLog.append(key)
+        if self.isIrreversible(move):
+            self.halfmoveClock = 0
+            self.repetitionStack.append(self.repetitionCounts)
+            self.repetitionCounts = {}
+        else:
+            self.halfmoveClock += 1
+        self.repetitionCounts[key] = self.repetitionCounts.get(key, 0) + 1
 
     def undoMove(self):
         if len(self.moveLog) == 0:
             return
         move = self.moveLog.pop()
+        self.attackMaps = {}
         self.board[move.start_row][move.start_col] = move.piece_moved
         self.board[move.end_row][move.end_col] = move.piece_captured
         self.whiteToMove = not self.whiteToMove
 
+        # restore piece lists
+        own_squares = self.pieceSquares[move.piece_moved[0]]
+        own_squares.remove((move.end_row, move.end_col))
+        own_squares.add((move.start_row, move.start_col))
+        if move.piece_captured != "--":
+            if move.isEnPassantMove:
+                self.pieceSquares[move.piece_captured[0]].add((move.start_row, move.end_col))
+            else:
+                self.pieceSquares[move.piece_captured[0]].add((move.end_row, move.end_col))
+
         # update kings
         if move.piece_moved == "wK":
             self.whiteKingLocation = (move.start_row, move.start_col)
@@ -137,121 +383,354 @@ class GameState():
             if move.end_col == 6:
                 self.board[move.end_row][7] = self.board[move.end_row][5]
                 self.board[move.end_row][5] = "--"
+                own_squares.remove((move.end_row, 5))
+                own_squares.add((move.end_row, 7))
             elif move.end_col == 2:
                 self.board[move.end_row][0] = self.board[move.end_row][3]
                 self.board[move.end_row][3] = "--"
+                own_squares.remove((move.end_row, 3))
+                own_squares.add((move.end_row, 0))
 
-        # restore en-passant possibility to previous move, if any
-        if len(self.moveLog) > 0:
-            prev = self.moveLog[-1]
-            if prev.piece_moved[1] == 'p' and abs(prev.start_row - prev.end_row) == 2:
-                self.enpassantPossible = ((prev.start_row + prev.end_row)//2, prev.start_col)
-            else:
-                self.enpassantPossible = ()
+        # drop this position from the repetition table, restoring the older table after an irreversible move
+        count = self.repetitionCounts[self.zobristKey] - 1
+        if count:
+            self.repetitionCounts[self.zobristKey] = count
         else:
-            self.enpassantPossible = ()
+            del self.repetitionCounts[self.zobristKey]
+        if self.isIrreversible(move):
+            self.repetitionCounts = self.repetitionStack.pop()
+        self.positionLog.pop()
 
-        # restore castling rights snapshot
-        self.castlingRightsLogs.pop()
-        if len(self.castlingRightsLogs) > 0:
-            self.currentCastlingRights = copy.deepcopy(self.castlingRightsLogs[-1])
-        else:
-            self.currentCastlingRights = CastlingRights(True, True, True, True)
+        # restore castling rights, en-passant square, halfmove clock and hash in one pop
+        self.castlingRights, self.enpassantPossible, self.halfmoveClock, self.zobristKey = self.undoLog.pop()
 
-        # pop last position key
-        if len(self.positionLog) > 0:
-            self.positionLog.pop()
+    # --------------- null move (search only) ----------------
+    def makeNullMove(self):
+        """
+        Pass the turn without moving, for null-move pruning in the search. Nothing goes into moveLog,
+        and the repetition table starts afresh since no position before a pass can recur after it.
+        Undo it with undoNullMove before undoing any earlier move.
+        """
+        self.undoLog.append((self.castlingRights, self.enpassantPossible, self.halfmoveClock, self.zobristKey))
+        key = self.zobristKey ^ ZOBRIST_BLACK_TO_MOVE
+        if self.enpassantPossible:
+            key ^= ZOBRIST_EP_FILE[self.enpassantPossible[1]]
+            self.enpassantPossible = ()
+        self.whiteToMove = not self.whiteToMove
+        self.zobristKey = key
+        self.positionLog.append(key)
+        self.repetitionStack.append(self.repetitionCounts)
+        self.repetitionCounts = {key: 1}
+
+    def undoNullMove(self):
+        # the board is untouched, so the cached attack maps stay valid across the pass
+        self.repetitionCounts = self.repetitionStack.pop()
+        self.positionLog.pop()
+        self.whiteToMove = not self.whiteToMove
+        self.castlingRights, self.enpassantPossible, self.halfmoveClock, self.zobristKey = self.undoLog.pop()
 
     # --------------- castling rights updates ----------------
     def updateCastlingRights(self, move):
-        # if king moves: lose both castling rights for that color
-        if move.piece_moved == "wK":
-            self.currentCastlingRights.wks = False
-            self.currentCastlingRights.wqs = False
-        elif move.piece_moved == "bK":
-            self.currentCastlingRights.bks = False
-            self.currentCastlingRights.bqs = False
-
-        # if rook moves: lose corresponding rook side
-        if move.piece_moved == "wR":
-            if move.start_row == 7 and move.start_col == 0:
-                self.currentCastlingRights.wqs = False
-            elif move.start_row == 7 and move.start_col == 7:
-                self.currentCastlingRights.wks = False
-        elif move.piece_moved == "bR":
-            if move.start_row == 0 and move.start_col == 0:
-                self.currentCastlingRights.bqs = False
-            elif move.start_row == 0 and move.start_col == 7:
-                self.currentCastlingRights.bks = False
-
-        # if rook is captured, lose rights too
-        if move.piece_captured == "wR":
-            if move.end_row == 7 and move.end_col == 0:
-                self.currentCastlingRights.wqs = False
-            elif move.end_row == 7 and move.end_col == 7:
-                self.currentCastlingRights.wks = False
-        elif move.piece_captured == "bR":
-            if move.end_row == 0 and move.end_col == 0:
-                self.currentCastlingRights.bqs = False
-            elif move.end_row == 0 and move.end_col == 7:
-                self.currentCastlingRights.bks = False
+        # a king or rook leaving its home square, or a rook captured on it, loses the matching rights
+        self.castlingRights &= CASTLING_KEEP[move.start_row*8 + move.start_col] & \
+            CASTLING_KEEP[move.end_row*8 + move.end_col]
 
     # --------------- move generation / validation ----------------
     def getValidMoves(self):
         """
-        Generate all possible moves, then remove moves that leave mover's king in check
+        Generate only legal moves from the pins and checks found by checkForPinsAndChecks, without
+        touching the board: pinned pieces stay on their pin ray, a single check restricts every
+        other piece to capturing or blocking the checker, a double check leaves only king moves,
+        and the king never steps onto an attacked square.
         """
-        tempEnPassant = self.enpassantPossible
-        tempCastRights = copy.deepcopy(self.currentCastlingRights)
-
-        self.pins, self.checks = self.checkForPinsAndChecks()
-
-        # generate all possible moves (including castles)
-        moves = self.getAllPossibleMoves(include_castles=True)
-
-        # filter out illegal moves by making them and checking king safety
-        for i in range(len(moves)-1, -1, -1):
-            move = moves[i]
-            self.makeMove(move)
-            # get mover color and corresponding king location AFTER the move
-            mover_color = move.piece_moved[0]  # 'w' or 'b'
-            if mover_color == 'w':
-                king_r, king_c = self.whiteKingLocation
-            else:
-                king_r, king_c = self.blackKingLocation
-
-            # if the mover's king is under attack now, move is illegal
-            if self.squareUnderAttack(king_r, king_c, ally_color=mover_color):
-                moves.remove(move)
-
-            self.undoMove()
+        moves = self.generateLegalMoves()
 
         # update checkMate / staleMate flags
         if len(moves) == 0:
-            if self.inCheck():
+            if self.checks:
                 self.checkMate = True
             else:
                 self.staleMate = True
         else:
             self.checkMate = False
             self.staleMate = False
+        return moves
+
+    def generateLegalMoves(self, captures=True, quiets=True, square=None):
+        """
+        Legal moves of the requested kinds, leaving checkMate/staleMate alone. `captures` covers
+        captures (en passant included) and promotions, `quiets` every other move; `square` limits
+        generation to the piece on that (row, col).
+        """
+        self.pins, self.checks = self.checkForPinsAndChecks()
+        self.pinDirections = {(pin[0], pin[1]): (pin[2], pin[3]) for pin in self.pins}
+        self.genCaptures = captures
+        self.genQuiets = quiets
+        if self.whiteToMove:
+            king_row, king_col = self.whiteKingLocation
+        else:
+            king_row, king_col = self.blackKingLocation
+
+        if self.checks:
+            moves = self.getEvasionMoves(king_row, king_col, square)
+        else:
+            moves = self.getAllPossibleMoves(include_castles=True, square=square)
+
+        self.genCaptures = self.genQuiets = True
+        return moves
 
-        # restore en passant and castling rights
-        self.enpassantPossible = tempEnPassant
-        self.currentCastlingRights = tempCastRights
+    def getCaptureMoves(self):
+        """
+        Legal captures (en passant included) and promotions only, most valuable victim first. No quiet
+        move is generated, which keeps quiescence search cheap; checkMate/staleMate are not updated.
+        """
+        moves = self.generateLegalMoves(captures=True, quiets=False)
+        moves.sort(key=mvvLvaScore, reverse=True)
         return moves
 
-    def getAllPossibleMoves(self, include_castles=True):
+    def getStagedMoves(self, hashMove=None, killers=(), history=None):
+        """
+        Yield legal moves lazily, one stage at a time: the hash move, then captures and promotions
+        that do not lose material (most valuable victim / least valuable attacker first), then the
+        killer moves, then the remaining quiet moves, and last the captures static exchange
+        evaluation says lose material. hashMove and killers are move_id codes, yielded only if legal here.
+        `history` is an optional 4096-entry butterfly table indexed by move_id & 0xFFF (from and to
+        square); quiet moves come highest score first.
+        A search that cuts off early never pays for the later stages. The caller must have undone
+        its own moves before resuming the generator; checkMate/staleMate are not updated.
+        """
+        if hashMove is not None:
+            for move in self.generateLegalMoves(square=divmod(hashMove & 63, 8)):
+                if move.move_id == hashMove:
+                    yield move
+                    break
+
+        losing_captures = []
+        for move in self.getCaptureMoves():
+            if move.move_id != hashMove:
+                if self.isLosingCapture(move):
+                    losing_captures.append(move)
+                else:
+                    yield move
+
+        played_killers = []
+        for killer in killers:
+            if killer is None or killer == hashMove or killer in played_killers:
+                continue
+            for move in self.generateLegalMoves(captures=False, quiets=True, square=divmod(killer & 63, 8)):
+                if move.move_id == killer:
+                    played_killers.append(killer)
+                    yield move
+                    break
+
+        quiets = self.generateLegalMoves(captures=False, quiets=True)
+        if history is not None:
+            quiets.sort(key=lambda move: history[move.move_id & 0xFFF], reverse=True)
+        for move in quiets:
+            if move.move_id != hashMove and move.move_id not in played_killers:
+                yield move
+
+        yield from losing_captures
+
+    # --------------- static exchange evaluation ----------------
+    def isLosingCapture(self, move):
+        """True if the capture or promotion loses material; capturing a piece worth at least the mover never does."""
+        victim = SEE_VALUES[move.piece_captured[1]]
+        if victim >= SEE_VALUES[move.piece_moved[1]] and not move.isPawnPromotion:
+            return False
+        return self.staticExchange(move) < 0
+
+    def staticExchange(self, move):
+        """
+        Material the side to move wins (in SEE_VALUES pawns) by playing `move` and then letting both
+        sides recapture on its target square, each with its least valuable attacker and each free to
+        stop when continuing would lose. Attackers hidden behind a slider that has just captured
+        (x-rays) join in as the square's attackers are recomputed with every capture taken off the
+        occupancy, so no move is made on the board. Pins and checks are ignored.
+        """
+        to_sq = move.end_row*8 + move.end_col
+        occupied = self._occupiedBits() ^ (1 << (move.start_row*8 + move.start_col))
+        if move.isEnPassantMove:
+            occupied ^= 1 << (move.start_row*8 + move.end_col)
+        gain = [SEE_VALUES[move.piece_captured[1]]]
+        on_square = SEE_VALUES[move.piece_moved[1]]  # value of the piece that would be captured next
+        if move.isPawnPromotion:
+            gain[0] += SEE_VALUES[move.promotionPiece] - SEE_VALUES['p']
+            on_square = SEE_VALUES[move.promotionPiece]
+        side = 'b' if move.piece_moved[0] == 'w' else 'w'
+        while True:
+            gain.append(on_square - gain[-1])  # what `side` would stand to win by recapturing, if it can
+            attacker, piece = self._leastValuableAttacker(self.seeAttackers(to_sq, occupied) & occupied, side)
+            if not attacker:
+                break
+            occupied ^= attacker
+            on_square = SEE_VALUES[piece]
+            side = 'b' if side == 'w' else 'w'
+        # the last entry is a capture nobody could make; negamax the rest back to the first capture
+        for d in range(len(gain) - 2, 0, -1):
+            gain[d - 1] = -max(-gain[d - 1], gain[d])
+        return gain[0]
+
+    def _occupiedBits(self):
+        occupied = 0
+        for color in 'wb':
+            for r, c in self.pieceSquares[color]:
+                occupied |= 1 << (r*8 + c)
+        return occupied
+
+    def seeAttackers(self, sq, occupied):
+        """
+        Bitmap of the pieces of both colors that attack sq when only the squares in `occupied` hold
+        pieces: sliders look through every square outside it. Pieces outside it may still be included
+        (the caller masks them out).
+        """
+        board = self.board
+        r, c = SQ_TO_RC[sq]
+        attackers = 0
+        for j, ray in enumerate(RAYS[r][c]):
+            for end_row, end_col in ray:
+                bit = 1 << (end_row*8 + end_col)
+                if not occupied & bit:
+                    continue
+                p_type = board[end_row][end_col][1]
+                if p_type == 'Q' or p_type == ('R' if j <= 3 else 'B'):
+                    attackers |= bit
+                break
+        for end_row, end_col in KNIGHT_TARGETS[r][c]:
+            if board[end_row][end_col][1] == 'N':
+                attackers |= 1 << (end_row*8 + end_col)
+        for end_row, end_col in KING_TARGETS[r][c]:
+            if board[end_row][end_col][1] == 'K':
+                attackers |= 1 << (end_row*8 + end_col)
+        # a pawn attacks sq from the squares an opposite-colored pawn on sq would attack
+        for color, pawn in (('b', 'wp'), ('w', 'bp')):
+            for end_row, end_col in PAWN_TARGETS[color][r][c]:
+                if board[end_row][end_col] == pawn:
+                    attackers |= 1 << (end_row*8 + end_col)
+        return attackers
+
+    def _leastValuableAttacker(self, attackers, color):
+        """(bit, piece type) of the least valuable `color` piece in the attackers bitmap, or (0, None)."""
+        board = self.board
+        best_bit, best_piece = 0, None
+        while attackers:
+            lsb = attackers & -attackers
+            attackers ^= lsb
+            r, c = SQ_TO_RC[lsb.bit_length() - 1]
+            piece = board[r][c]
+            if piece[0] == color and (best_piece is None or SEE_VALUES[piece[1]] < SEE_VALUES[best_piece]):
+                best_bit, best_piece = lsb, piece[1]
+        return best_bit, best_piece
+
+    # --------------- check evasions ----------------
+    def getEvasionMoves(self, king_row, king_col, square=None):
+        """
+        Legal moves out of check, built from self.checks rather than filtering every piece's moves:
+        the king steps aside and, on a single check, the other pieces may only capture the checker
+        or block the checking ray. `square` limits generation to the piece on that (row, col).
+        """
         moves = []
-        for r in range(len(self.board)):
-            for c in range(len(self.board[r])):
-                turn = self.board[r][c][0]
-                if (turn == 'w' and self.whiteToMove) or (turn == 'b' and not self.whiteToMove):
-                    piece = self.board[r][c][1]
-                    if piece == 'K':
-                        self.getKingMoves(r, c, moves, include_castles)
-                    else:
-                        self.moveFunction[piece](r, c, moves)
+        if square is None or square == (king_row, king_col):
+            self.getKingMoves(king_row, king_col, moves, include_castles=False)
+        if len(self.checks) > 1:
+            return moves  # double check: only the king can move
+
+        check_row, check_col, d_row, d_col = self.checks[0]
+        self.getMovesTo(check_row, check_col, moves, square)
+        # squares between the king and a sliding checker, walked along the checking ray
+        block_squares = []
+        if self.board[check_row][check_col][1] != 'N':
+            for end_square in RAYS[king_row][king_col][RAY_DIRECTIONS.index((d_row, d_col))]:
+                if end_square == (check_row, check_col):
+                    break
+                block_squares.append(end_square)
+                self.getMovesTo(end_square[0], end_square[1], moves, square)
+
+        # en passant resolves the check by taking a checking pawn or by landing on the ray
+        if self.genCaptures and self.enpassantPossible:
+            ep_row, ep_col = self.enpassantPossible
+            pawn_row = ep_row + (1 if self.whiteToMove else -1)
+            if (check_row, check_col) == (pawn_row, ep_col) or (ep_row, ep_col) in block_squares:
+                ally_pawn = ('w' if self.whiteToMove else 'b') + 'p'
+                for c in (ep_col - 1, ep_col + 1):
+                    if 0 <= c <= 7 and self.board[pawn_row][c] == ally_pawn and square in (None, (pawn_row, c)):
+                        pin_direction = self.pinDirections.get((pawn_row, c))
+                        direction = (ep_row - pawn_row, ep_col - c)
+                        if pin_direction in (None, direction, (-direction[0], -direction[1])) and \
+                           not self.enPassantExposesKing(pawn_row, c, ep_col):
+                            moves.append(Move((pawn_row, c), (ep_row, ep_col), self.board, isEnPassantMove=True))
+        return moves
+
+    def getMovesTo(self, r, c, moves, square=None):
+        """
+        Add the pin-respecting moves of the side to move's non-king pieces that land on (r, c): captures
+        if an enemy piece stands there, slides and pawn pushes if it is empty (en passant excluded).
+        """
+        board = self.board
+        if self.whiteToMove:
+            ally, d_row, double_row = 'w', -1, 4
+        else:
+            ally, d_row, double_row = 'b', 1, 3
+        capture = board[r][c] != "--"
+        promotion = r == 0 or r == 7
+        piece_wanted = self.genCaptures if capture else self.genQuiets
+        pawn_wanted = self.genCaptures if capture or promotion else self.genQuiets
+        pin_directions = self.pinDirections
+
+        if piece_wanted:
+            # sliders: the first piece along each ray from the target, moving back along that ray
+            for j, ray in enumerate(RAYS[r][c]):
+                for start_row, start_col in ray:
+                    piece = board[start_row][start_col]
+                    if piece == "--":
+                        continue
+                    if piece[0] == ally and (piece[1] == 'Q' or piece[1] == ('R' if j <= 3 else 'B')) and \
+                       square in (None, (start_row, start_col)):
+                        pin_direction = pin_directions.get((start_row, start_col))
+                        d = RAY_DIRECTIONS[j]
+                        if pin_direction is None or pin_direction == d or pin_direction == (-d[0], -d[1]):
+                            moves.append(Move((start_row, start_col), (r, c), board))
+                    break
+            # knights (a pinned knight can never move)
+            ally_knight = ally + 'N'
+            for start_row, start_col in KNIGHT_TARGETS[r][c]:
+                if board[start_row][start_col] == ally_knight and (start_row, start_col) not in pin_directions and \
+                   square in (None, (start_row, start_col)):
+                    moves.append(Move((start_row, start_col), (r, c), board))
+
+        if pawn_wanted:
+            ally_pawn = ally + 'p'
+            if capture:
+                # an ally pawn captures onto (r,c) from the squares an enemy pawn on (r,c) would attack
+                for start_row, start_col in PAWN_TARGETS['b' if ally == 'w' else 'w'][r][c]:
+                    if board[start_row][start_col] == ally_pawn and square in (None, (start_row, start_col)):
+                        pin_direction = pin_directions.get((start_row, start_col))
+                        direction = (r - start_row, c - start_col)
+                        if pin_direction in (None, direction, (-direction[0], -direction[1])):
+                            self.addPawnMove((start_row, start_col), (r, c), moves)
+            elif 1 <= r - d_row <= 6:
+                start_row = r - d_row
+                if board[start_row][c] == "--" and r == double_row:
+                    start_row -= d_row
+                if board[start_row][c] == ally_pawn and square in (None, (start_row, c)):
+                    pin_direction = pin_directions.get((start_row, c))
+                    if pin_direction is None or pin_direction[1] == 0:
+                        self.addPawnMove((start_row, c), (r, c), moves)
+
+    def getAllPossibleMoves(self, include_castles=True, square=None):
+        moves = []
+        ally = 'w' if self.whiteToMove else 'b'
+        if square is None:
+            # iterate over the side to move's piece list; generators never add or remove pieces
+            squares = self.pieceSquares[ally]
+        else:
+            squares = (square,) if square in self.pieceSquares[ally] else ()
+        for r, c in squares:
+            piece = self.board[r][c][1]
+            if piece == 'K':
+                self.getKingMoves(r, c, moves, include_castles)
+            else:
+                self.moveFunction[piece](r, c, moves)
         return moves
 
     # ------------ pins and checks detection ----------------
@@ -267,48 +746,40 @@ class GameState():
             ally_color = "b"
             start_row, start_col = self.blackKingLocation
 
-        directions = ((-1,0),(0,-1),(1,0),(0,1),(-1,-1),(-1,1),(1,-1),(1,1))
-        for j in range(len(directions)):
-            d = directions[j]
+        board = self.board
+        for j, ray in enumerate(RAYS[start_row][start_col]):
+            d = RAY_DIRECTIONS[j]
             possible_pin = ()
-            for i in range(1,8):
-                end_row = start_row + d[0]*i
-                end_col = start_col + d[1]*i
-                if 0 <= end_row < 8 and 0 <= end_col < 8:
-                    end_piece = self.board[end_row][end_col]
-                    if end_piece[0] == ally_color and end_piece[1] != 'K':
+            for i, (end_row, end_col) in enumerate(ray):
+                end_piece = board[end_row][end_col]
+                if end_piece == "--":
+                    continue
+                if end_piece[0] == ally_color and end_piece[1] != 'K':
+                    if possible_pin == ():
+                        possible_pin = (end_row, end_col, d[0], d[1])
+                    else:
+                        break
+                elif end_piece[0] == enemy_color:
+                    t = end_piece[1]
+                    # rook/queen orthogonal, bishop/queen diagonal, pawn (one diag away), king (one away)
+                    if (j <= 3 and t == 'R') or \
+                       (j >= 4 and t == 'B') or \
+                       (t == 'Q') or \
+                       (i == 0 and t == 'K') or \
+                       (i == 0 and t == 'p' and ((enemy_color == 'w' and 6 <= j <= 7) or (enemy_color == 'b' and 4 <= j <= 5))):
                         if possible_pin == ():
-                            possible_pin = (end_row, end_col, d[0], d[1])
+                            checks.append((end_row, end_col, d[0], d[1]))
                         else:
-                            break
-                    elif end_piece[0] == enemy_color:
-                        t = end_piece[1]
-                        # rook/queen orthogonal, bishop/queen diagonal, pawn (one diag away), king (one away)
-                        if (0 <= j <= 3 and t == 'R') or \
-                           (4 <= j <= 7 and t == 'B') or \
-                           (t == 'Q') or \
-                           (i == 1 and t == 'K') or \
-                           (i == 1 and t == 'p' and ((enemy_color == 'w' and 6 <= j <=7) or (enemy_color == 'b' and 4 <= j <=5))):
-                            if possible_pin == ():
-                                checks.append((end_row, end_col, d[0], d[1]))
-                                break
-                            else:
-                                pins.append(possible_pin)
-                                break
-                        else:
-                            break
+                            pins.append(possible_pin)
+                    break
                 else:
                     break
 
         # knight checks
-        knight_moves = ((-2,-1),(-2,1),(-1,-2),(-1,2),(1,-2),(1,2),(2,-1),(2,1))
-        for m in knight_moves:
-            end_row = start_row + m[0]
-            end_col = start_col + m[1]
-            if 0 <= end_row < 8 and 0 <= end_col < 8:
-                end_piece = self.board[end_row][end_col]
-                if end_piece[0] == enemy_color and end_piece[1] == 'N':
-                    checks.append((end_row, end_col, m[0], m[1]))
+        enemy_knight = enemy_color + 'N'
+        for end_row, end_col in KNIGHT_TARGETS[start_row][start_col]:
+            if board[end_row][end_col] == enemy_knight:
+                checks.append((end_row, end_col, end_row - start_row, end_col - start_col))
 
         return pins, checks
 
@@ -326,255 +797,209 @@ class GameState():
         Return True if square (r,c) is attacked by the opponent.
         ally_color: 'w' or 'b' - the side considered allied on that square.
         If ally_color is None, determine from self.whiteToMove (the side to move).
-        This function scans rays, knight moves and pawn attacks. It does NOT call getAllPossibleMoves.
+        This function walks the precomputed rays, knight and pawn tables. It does NOT call getAllPossibleMoves.
         """
         if ally_color is None:
             ally_color = 'w' if self.whiteToMove else 'b'
         enemy_color = 'w' if ally_color == 'b' else 'b'
-
-        # directions: orthogonal then diagonal
-        directions = ((-1,0),(0,-1),(1,0),(0,1),(-1,-1),(-1,1),(1,-1),(1,1))
-        for j, d in enumerate(directions):
-            for i in range(1,8):
-                end_row = r + d[0]*i
-                end_col = c + d[1]*i
-                if 0 <= end_row < 8 and 0 <= end_col < 8:
-                    end_piece = self.board[end_row][end_col]
-                    if end_piece == "--":
-                        continue
-                    if end_piece[0] == ally_color:
-                        # blocked by ally
-                        break
-                    # enemy piece found
+        board = self.board
+
+        # rays: orthogonal (j 0..3) then diagonal (4..7)
+        for j, ray in enumerate(RAYS[r][c]):
+            for end_row, end_col in ray:
+                end_piece = board[end_row][end_col]
+                if end_piece == "--":
+                    continue
+                if end_piece[0] == enemy_color:
+                    # rook orthogonal, bishop diagonal, queen any, king one square away
                     p_type = end_piece[1]
-                    # rook orthogonal (j 0..3), bishop diagonal (4..7), queen any, king one square, pawns special-case
-                    if (0 <= j <= 3 and p_type == 'R') or \
-                       (4 <= j <= 7 and p_type == 'B') or \
-                       (p_type == 'Q') or \
-                       (i == 1 and p_type == 'K'):
+                    if p_type == 'Q' or p_type == ('R' if j <= 3 else 'B') or \
+                       (p_type == 'K' and (end_row, end_col) == ray[0]):
                         return True
-                    else:
-                        # enemy that doesn't attack in this direction blocks ray
-                        break
-                else:
-                    break
+                # any other piece blocks the ray
+                break
 
         # knight attacks
-        knight_moves = ((-2,-1),(-2,1),(-1,-2),(-1,2),(1,-2),(1,2),(2,-1),(2,1))
-        for m in knight_moves:
-            end_row = r + m[0]
-            end_col = c + m[1]
-            if 0 <= end_row < 8 and 0 <= end_col < 8:
-                end_piece = self.board[end_row][end_col]
-                if end_piece[0] == enemy_color and end_piece[1] == 'N':
-                    return True
-
-        # pawn attacks (direction depends on pawn color)
-        if ally_color == 'w':
-            # black pawns attack from r-1
-            if r - 1 >= 0:
-                if c - 1 >= 0 and self.board[r-1][c-1] == 'bp':
-                    return True
-                if c + 1 < 8 and self.board[r-1][c+1] == 'bp':
-                    return True
-        else:
-            # white pawns attack from r+1
-            if r + 1 < 8:
-                if c - 1 >= 0 and self.board[r+1][c-1] == 'wp':
-                    return True
-                if c + 1 < 8 and self.board[r+1][c+1] == 'wp':
-                    return True
+        enemy_knight = enemy_color + 'N'
+        for end_row, end_col in KNIGHT_TARGETS[r][c]:
+            if board[end_row][end_col] == enemy_knight:
+                return True
+
+        # pawn attacks: an enemy pawn attacks (r,c) from the squares an ally pawn on (r,c) would attack
+        enemy_pawn = enemy_color + 'p'
+        for end_row, end_col in PAWN_TARGETS[ally_color][r][c]:
+            if board[end_row][end_col] == enemy_pawn:
+                return True
 
         return False
 
+    # --------------- cached attack maps ----------------
+    def attackMap(self, color):
+        """
+        Bitmap (bit row*8 + col) of every square `color` attacks, with the enemy king left out so the
+        squares behind it on a checking line count as attacked. Computed at most once per position:
+        makeMove/undoMove drop the cached maps.
+        """
+        attacks = self.attackMaps.get(color)
+        if attacks is None:
+            attacks = self.attackMaps[color] = self._computeAttackMap(color)
+        return attacks
+
+    def _computeAttackMap(self, color):
+        board = self.board
+        enemy_king = ('b' if color == 'w' else 'w') + 'K'
+        attacks = 0
+        for r, c in self.pieceSquares[color]:
+            sq = r*8 + c
+            piece = board[r][c][1]
+            if piece == 'p':
+                attacks |= PAWN_ATTACK_BB[color][sq]
+            elif piece == 'N':
+                attacks |= KNIGHT_BB[sq]
+            elif piece == 'K':
+                attacks |= KING_BB[sq]
+            else:
+                first, last = SLIDER_RAYS[piece]
+                rays = RAYS[r][c]
+                for j in range(first, last):
+                    for end_row, end_col in rays[j]:
+                        attacks |= 1 << (end_row*8 + end_col)
+                        end_piece = board[end_row][end_col]
+                        if end_piece != "--" and end_piece != enemy_king:
+                            break
+        return attacks
+
     # --------------- per-piece move generators ----------------
+    # self.pinDirections maps a pinned piece's square to the direction from its king; a pinned piece
+    # may only move along that direction or its opposite. self.genCaptures / self.genQuiets select
+    # captures and promotions / all other moves.
     def getPawnMoves(self, r, c, moves):
-        piece_pinned = False
-        pin_direction = ()
-        for i in range(len(self.pins)-1, -1, -1):
-            if self.pins[i][0] == r and self.pins[i][1] == c:
-                piece_pinned = True
-                pin_direction = (self.pins[i][2], self.pins[i][3])
-                self.pins.remove(self.pins[i])
-                break
+        pin_direction = self.pinDirections.get((r, c))
 
         if self.whiteToMove:
-            # one-square forward
-            if r-1 >= 0 and self.board[r-1][c] == "--":
-                if not piece_pinned or pin_direction == (-1,0):
-                    moves.append(Move((r,c),(r-1,c), self.board))
-                    # two-square from starting rank
-                    if r == 6 and self.board[r-2][c] == "--":
-                        moves.append(Move((r,c),(r-2,c), self.board))
-            # captures
-            if c-1 >= 0:
-                if not piece_pinned or pin_direction == (-1,-1):
-                    if self.board[r-1][c-1][0] == 'b':
-                        moves.append(Move((r,c),(r-1,c-1), self.board))
-            if c+1 <= 7:
-                if not piece_pinned or pin_direction == (-1,1):
-                    if self.board[r-1][c+1][0] == 'b':
-                        moves.append(Move((r,c),(r-1,c+1), self.board))
-            # en-passant
-            if self.enpassantPossible:
-                if (r-1, c-1) == self.enpassantPossible:
-                    if not piece_pinned or pin_direction == (-1,-1):
-                        moves.append(Move((r,c),(r-1,c-1), self.board, isEnPassantMove=True))
-                if (r-1, c+1) == self.enpassantPossible:
-                    if not piece_pinned or pin_direction == (-1,1):
-                        moves.append(Move((r,c),(r-1,c+1), self.board, isEnPassantMove=True))
+            d_row, start_row, enemy = -1, 6, 'b'
+        else:
+            d_row, start_row, enemy = 1, 1, 'w'
+        end_row = r + d_row
+        # one-square forward, and two squares from the starting rank; pushes onto the last rank promote
+        if self.board[end_row][c] == "--":
+            if pin_direction is None or pin_direction[1] == 0:
+                if end_row == 0 or end_row == 7:
+                    if self.genCaptures:
+                        self.addPawnMove((r,c), (end_row,c), moves)
+                elif self.genQuiets:
+                    moves.append(Move((r,c),(end_row,c), self.board))
+                    if r == start_row and self.board[r + 2*d_row][c] == "--":
+                        moves.append(Move((r,c),(r + 2*d_row,c), self.board))
+        if not self.genCaptures:
+            return
+        # captures and en-passant
+        for end_row, end_col in PAWN_TARGETS['w' if self.whiteToMove else 'b'][r][c]:
+            d_col = end_col - c
+            if pin_direction is None or pin_direction == (d_row, d_col) or pin_direction == (-d_row, -d_col):
+                if self.board[end_row][end_col][0] == enemy:
+                    self.addPawnMove((r,c), (end_row,end_col), moves)
+                elif (end_row, end_col) == self.enpassantPossible and not self.enPassantExposesKing(r, c, end_col):
+                    moves.append(Move((r,c),(end_row,end_col), self.board, isEnPassantMove=True))
+
+    def addPawnMove(self, start, end, moves):
+        """Append a pawn move, expanded into one move per promotion piece on the last rank."""
+        if end[0] == 0 or end[0] == 7:
+            for piece in Move.PROMOTION_CHOICES:
+                moves.append(Move(start, end, self.board, promotionPiece=piece))
         else:
-            # black pawn moves downwards
-            if r+1 <= 7 and self.board[r+1][c] == "--":
-                if not piece_pinned or pin_direction == (1,0):
-                    moves.append(Move((r,c),(r+1,c), self.board))
-                    if r == 1 and self.board[r+2][c] == "--":
-                        moves.append(Move((r,c),(r+2,c), self.board))
-            if c-1 >= 0:
-                if not piece_pinned or pin_direction == (1,-1):
-                    if self.board[r+1][c-1][0] == 'w':
-                        moves.append(Move((r,c),(r+1,c-1), self.board))
-            if c+1 <= 7:
-                if not piece_pinned or pin_direction == (1,1):
-                    if self.board[r+1][c+1][0] == 'w':
-                        moves.append(Move((r,c),(r+1,c+1), self.board))
-            # en-passant
-            if self.enpassantPossible:
-                if (r+1, c-1) == self.enpassantPossible:
-                    if not piece_pinned or pin_direction == (1,-1):
-                        moves.append(Move((r,c),(r+1,c-1), self.board, isEnPassantMove=True))
-                if (r+1, c+1) == self.enpassantPossible:
-                    if not piece_pinned or pin_direction == (1,1):
-                        moves.append(Move((r,c),(r+1,c+1), self.board, isEnPassantMove=True))
+            moves.append(Move(start, end, self.board))
 
-    def getRookMoves(self, r, c, moves):
-        piece_pinned = False
-        pin_direction = ()
-        for i in range(len(self.pins)-1,-1,-1):
-            if self.pins[i][0] == r and self.pins[i][1] == c:
-                piece_pinned = True
-                pin_direction = (self.pins[i][2], self.pins[i][3])
-                if self.board[r][c][1] != 'Q':
-                    self.pins.remove(self.pins[i])
-                break
+    def enPassantExposesKing(self, r, c, capture_col):
+        """
+        True if capturing en passant from (r,c) onto column capture_col would leave the king in check
+        along the rank: both pawns leave the row at once, which no pin can describe.
+        """
+        if self.whiteToMove:
+            king_row, king_col = self.whiteKingLocation
+            enemy = 'b'
+        else:
+            king_row, king_col = self.blackKingLocation
+            enemy = 'w'
+        if king_row != r:
+            return False
+        # walk the rank from the king towards the pawns (ray 3 runs east, ray 1 west)
+        for end_row, end_col in RAYS[king_row][king_col][3 if c > king_col else 1]:
+            if end_col != c and end_col != capture_col:
+                piece = self.board[end_row][end_col]
+                if piece != "--":
+                    return piece[0] == enemy and piece[1] in 'RQ'
+        return False
 
-        directions = ((-1,0),(0,-1),(1,0),(0,1))
+    def _getSlidingMoves(self, r, c, moves, first, last):
+        """Slide along RAYS[r][c][first:last] (0..3 orthogonal, 4..7 diagonal)."""
+        pin_direction = self.pinDirections.get((r, c))
         enemy = 'b' if self.whiteToMove else 'w'
-        for d in directions:
-            for i in range(1,8):
-                end_row = r + d[0]*i
-                end_col = c + d[1]*i
-                if 0 <= end_row < 8 and 0 <= end_col < 8:
-                    if not piece_pinned or pin_direction == d or pin_direction == (-d[0], -d[1]):
-                        end_piece = self.board[end_row][end_col]
-                        if end_piece == "--":
-                            moves.append(Move((r,c),(end_row,end_col), self.board))
-                        elif end_piece[0] == enemy:
-                            moves.append(Move((r,c),(end_row,end_col), self.board))
-                            break
-                        else:
-                            break
-                    else:
-                        break
+        captures, quiets = self.genCaptures, self.genQuiets
+        board = self.board
+        rays = RAYS[r][c]
+        for j in range(first, last):
+            if pin_direction is not None:
+                d = RAY_DIRECTIONS[j]
+                if pin_direction != d and pin_direction != (-d[0], -d[1]):
+                    continue
+            for end_square in rays[j]:
+                end_piece = board[end_square[0]][end_square[1]]
+                if end_piece == "--":
+                    if quiets:
+                        moves.append(Move((r,c), end_square, board))
                 else:
+                    if captures and end_piece[0] == enemy:
+                        moves.append(Move((r,c), end_square, board))
                     break
 
-    def getBishopMoves(self, r, c, moves):
-        piece_pinned = False
-        pin_direction = ()
-        for i in range(len(self.pins)-1,-1,-1):
-            if self.pins[i][0] == r and self.pins[i][1] == c:
-                piece_pinned = True
-                pin_direction = (self.pins[i][2], self.pins[i][3])
-                self.pins.remove(self.pins[i])
-                break
+    def getRookMoves(self, r, c, moves):
+        self._getSlidingMoves(r, c, moves, 0, 4)
 
-        directions = ((-1,-1),(-1,1),(1,-1),(1,1))
-        enemy = 'b' if self.whiteToMove else 'w'
-        for d in directions:
-            for i in range(1,8):
-                end_row = r + d[0]*i
-                end_col = c + d[1]*i
-                if 0 <= end_row < 8 and 0 <= end_col < 8:
-                    if not piece_pinned or pin_direction == d or pin_direction == (-d[0], -d[1]):
-                        end_piece = self.board[end_row][end_col]
-                        if end_piece == "--":
-                            moves.append(Move((r,c),(end_row,end_col), self.board))
-                        elif end_piece[0] == enemy:
-                            moves.append(Move((r,c),(end_row,end_col), self.board))
-                            break
-                        else:
-                            break
-                    else:
-                        break
-                else:
-                    break
+    def getBishopMoves(self, r, c, moves):
+        self._getSlidingMoves(r, c, moves, 4, 8)
 
     def getKnightMoves(self, r, c, moves):
-        piece_pinned = False
-        for i in range(len(self.pins)-1,-1,-1):
-            if self.pins[i][0] == r and self.pins[i][1] == c:
-                piece_pinned = True
-                self.pins.remove(self.pins[i])
-                break
-        if piece_pinned:
-            return
+        if (r, c) in self.pinDirections:
+            return  # a pinned knight can never move
 
-        knight_moves = ((-2,-1),(-2,1),(-1,-2),(-1,2),(1,-2),(1,2),(2,-1),(2,1))
-        ally = 'w' if self.whiteToMove else 'b'
-        for m in knight_moves:
-            end_row = r + m[0]
-            end_col = c + m[1]
-            if 0 <= end_row < 8 and 0 <= end_col < 8:
-                end_piece = self.board[end_row][end_col]
-                if end_piece[0] != ally:
-                    moves.append(Move((r,c),(end_row,end_col), self.board))
+        wanted = self._wantedTargets()
+        for end_square in KNIGHT_TARGETS[r][c]:
+            if self.board[end_square[0]][end_square[1]][0] in wanted:
+                moves.append(Move((r,c), end_square, self.board))
+
+    def _wantedTargets(self):
+        """First characters of the target squares a knight or king may move to: '-' empty, or the enemy color."""
+        enemy = 'b' if self.whiteToMove else 'w'
+        if self.genQuiets:
+            return ('-', enemy) if self.genCaptures else ('-',)
+        return (enemy,) if self.genCaptures else ()
 
     def getQueenMoves(self, r, c, moves):
-        self.getRookMoves(r,c,moves)
-        self.getBishopMoves(r,c,moves)
+        self._getSlidingMoves(r, c, moves, 0, 8)
 
     def getKingMoves(self, r, c, moves, include_castles=True):
-        # normal king moves (note: this does not yet check for moving into check)
-        king_moves = ((-1,-1),(-1,0),(-1,1),(0,-1),(0,1),(1,-1),(1,0),(1,1))
         ally = 'w' if self.whiteToMove else 'b'
-        for m in king_moves:
-            end_row = r + m[0]
-            end_col = c + m[1]
-            if 0 <= end_row < 8 and 0 <= end_col < 8:
-                end_piece = self.board[end_row][end_col]
-                if end_piece[0] != ally:
-                    # temporarily set king location to check square safety (avoid adding moves that move into attack)
-                    orig_wk = self.whiteKingLocation
-                    orig_bk = self.blackKingLocation
-                    if ally == 'w':
-                        self.whiteKingLocation = (end_row, end_col)
-                    else:
-                        self.blackKingLocation = (end_row, end_col)
-
-                    if not self.squareUnderAttack(end_row, end_col, ally):
-                        moves.append(Move((r,c),(end_row,end_col), self.board))
-
-                    # restore kings
-                    self.whiteKingLocation = orig_wk
-                    self.blackKingLocation = orig_bk
-
-        # castling moves
-        if include_castles:
-            # can't castle if currently in check
-            if self.squareUnderAttack(r, c, ally):
-                return
+        wanted = self._wantedTargets()
+        # enemy attacks see through our king, so a slider checking it still covers the square behind it
+        danger = self.attackMap('b' if ally == 'w' else 'w')
+        for end_row, end_col in KING_TARGETS[r][c]:
+            if self.board[end_row][end_col][0] in wanted and not (danger >> (end_row*8 + end_col)) & 1:
+                moves.append(Move((r,c), (end_row, end_col), self.board))
+
+        # castling moves (callers only ask for them when the king is not in check)
+        if include_castles and self.genQuiets:
             # king-side castling
-            if (ally == 'w' and self.currentCastlingRights.wks) or (ally == 'b' and self.currentCastlingRights.bks):
+            if self.castlingRights & (WKS if ally == 'w' else BKS):
                 # squares between king and rook must be empty and not under attack: f (c+1) and g (c+2)
                 if self.board[r][c+1] == "--" and self.board[r][c+2] == "--":
-                    if not self.squareUnderAttack(r, c+1, ally) and not self.squareUnderAttack(r, c+2, ally):
+                    if not (danger >> (r*8 + c+1)) & 3:
                         moves.append(Move((r,c),(r, c+2), self.board, isCastleMove=True))
             # queen-side castling
-            if (ally == 'w' and self.currentCastlingRights.wqs) or (ally == 'b' and self.currentCastlingRights.bqs):
+            if self.castlingRights & (WQS if ally == 'w' else BQS):
                 # squares between king and rook must be empty: d (c-1), c (c-2), b (c-3)
                 if self.board[r][c-1] == "--" and self.board[r][c-2] == "--" and self.board[r][c-3] == "--":
-                    if not self.squareUnderAttack(r, c-1, ally) and not self.squareUnderAttack(r, c-2, ally):
+                    if not (danger >> (r*8 + c-2)) & 3:
                         moves.append(Move((r,c),(r, c-2), self.board, isCastleMove=True))
 
 
@@ -587,6 +1012,21 @@ class CastlingRights:
 
 
 class Move:
+    """
+    A move is identified by a packed 16-bit code, move_id:
+      bits 0-5   start square (row*8 + col)
+      bits 6-11  end square
+      bits 12-13 promotion piece, index into PROMOTION_CODES ("NBRQ")
+      bits 14-15 move type: NORMAL, PROMOTION, EN_PASSANT or CASTLE
+    Move objects are a light __slots__ view of that code plus the pieces involved; the code alone is
+    what equality, hashing and the search tables use, and Move.fromId rebuilds the view from it.
+    """
+    __slots__ = ('start_row', 'start_col', 'end_row', 'end_col', 'piece_moved', 'piece_captured', 'move_id')
+
+    NORMAL, PROMOTION, EN_PASSANT, CASTLE = 0, 1, 2, 3
+    PROMOTION_CODES = "NBRQ"
+    PROMOTION_CHOICES = "QRBN"  # order in which generators emit promotions
+
     ranks_to_rows = {"1": 7, "2": 6, "3": 5, "4": 4,
                      "5": 3, "6": 2, "7": 1, "8": 0}
     rows_to_ranks = {v: k for k, v in ranks_to_rows.items()}
@@ -594,42 +1034,355 @@ class Move:
                      "e": 4, "f": 5, "g": 6, "h": 7}
     cols_to_files = {v: k for k, v in files_to_cols.items()}
 
-    def __init__(self, start_sq, end_sq, board, isEnPassantMove=False, isCastleMove=False):
-        self.start_row = start_sq[0]
-        self.start_col = start_sq[1]
-        self.end_row = end_sq[0]
-        self.end_col = end_sq[1]
-        self.piece_moved = board[self.start_row][self.start_col]
-        self.piece_captured = board[self.end_row][self.end_col]
-        self.isPawnPromotion = False
-
-        # pawn promotion
-        if (self.piece_moved == 'wp' and self.end_row == 0) or (self.piece_moved == 'bp' and self.end_row == 7):
-            self.isPawnPromotion = True
-
-        # en-passant
-        self.isEnPassantMove = isEnPassantMove
-        if self.isEnPassantMove:
-            # captured pawn sits behind destination
-            if self.piece_moved[0] == 'w':
-                self.piece_captured = 'bp'
-            else:
-                self.piece_captured = 'wp'
-
-        # castle
-        self.isCastleMove = isCastleMove
-
-        # unique id
-        self.move_id = self.start_row * 1000 + self.start_col * 100 + self.end_row * 10 + self.end_col
+    def __init__(self, start_sq, end_sq, board, isEnPassantMove=False, isCastleMove=False, promotionPiece='Q'):
+        start_row, start_col = self.start_row, self.start_col = start_sq
+        end_row, end_col = self.end_row, self.end_col = end_sq
+        self.piece_moved = piece_moved = board[start_row][start_col]
+        self.piece_captured = board[end_row][end_col]
+        code = start_row*8 + start_col | (end_row*8 + end_col) << 6
+
+        # special moves are recognised from the board as well, so a Move built from two UI clicks
+        # gets the same move_id as the generated one
+        if piece_moved[1] == 'p':
+            if end_row == 0 or end_row == 7:
+                code |= self.PROMOTION << 14 | self.PROMOTION_CODES.index(promotionPiece) << 12
+            elif isEnPassantMove or (start_col != end_col and self.piece_captured == "--"):
+                code |= self.EN_PASSANT << 14
+                # captured pawn sits behind destination
+                self.piece_captured = 'bp' if piece_moved[0] == 'w' else 'wp'
+        elif isCastleMove or (piece_moved[1] == 'K' and abs(end_col - start_col) == 2):
+            code |= self.CASTLE << 14
+        self.move_id = code
+
+    @classmethod
+    def fromId(cls, move_id, board):
+        """Build the Move view of a packed code for the position on `board`."""
+        start_sq, end_sq = move_id & 63, (move_id >> 6) & 63
+        return cls(divmod(start_sq, 8), divmod(end_sq, 8), board,
+                   promotionPiece=cls.PROMOTION_CODES[(move_id >> 12) & 3])
+
+    @property
+    def isPawnPromotion(self):
+        return self.move_id >> 14 == self.PROMOTION
+
+    @property
+    def isEnPassantMove(self):
+        return self.move_id >> 14 == self.EN_PASSANT
+
+    @property
+    def isCastleMove(self):
+        return self.move_id >> 14 == self.CASTLE
+
+    @property
+    def promotionPiece(self):
+        """Piece letter a promoting pawn becomes ('Q', 'R', 'B' or 'N'); meaningless for other moves."""
+        return self.PROMOTION_CODES[(self.move_id >> 12) & 3]
 
     def __eq__(self, other):
         if isinstance(other, Move):
             return self.move_id == other.move_id
         return False
 
+    def __hash__(self):
+        return self.move_id
+
     # original snake_case method (your UI called this in many places)
     def get_chess_notation(self):
-        return self.get_rank_file(self.start_row, self.start_col) + self.get_rank_file(self.end_row, self.end_col)
+        notation = self.get_rank_file(self.start_row, self.start_col) + self.get_rank_file(self.end_row, self.end_col)
+        if self.isPawnPromotion:
+            notation += self.promotionPiece.lower()
+        return notation
 
     def get_rank_file(self, r, c):
         return self.cols_to_files[c] + self.rows_to_ranks[r]
+
+
+class BitboardGameState(GameState):
+    """
+    GameState backed by 64-bit integer bitboards: one per piece ("wp", "bK", ...) plus
+    per-color and total occupancy. Move generation and attack tests work on the bitboards;
+    self.board is still kept in sync by the inherited makeMove/undoMove for the UI and Move objects.
+    """
+    def __init__(self):
+        super().__init__()
+        self.syncBitboards()
+
+    def loadFen(self, fen):
+        super().loadFen(fen)
+        self.syncBitboards()
+
+    def syncBitboards(self):
+        """Rebuild every bitboard from self.board."""
+        self.bitboards = {color + piece: 0 for color in "wb" for piece in "pNBRQK"}
+        self.occupancy = {'w': 0, 'b': 0}
+        for r in range(8):
+            for c in range(8):
+                piece = self.board[r][c]
+                if piece != "--":
+                    bit = 1 << (r*8 + c)
+                    self.bitboards[piece] |= bit
+                    self.occupancy[piece[0]] |= bit
+        self.allOccupancy = self.occupancy['w'] | self.occupancy['b']
+
+    def _toggle(self, piece, sq):
+        bit = 1 << sq
+        self.bitboards[piece] ^= bit
+        self.occupancy[piece[0]] ^= bit
+        self.allOccupancy ^= bit
+
+    def _toggleMove(self, move):
+        """XOR a move into the bitboards. XOR is its own inverse, so undo applies the same toggles."""
+        start_sq = move.start_row*8 + move.start_col
+        end_sq = move.end_row*8 + move.end_col
+        self._toggle(move.piece_moved, start_sq)
+        if move.isPawnPromotion:
+            self._toggle(move.piece_moved[0] + move.promotionPiece, end_sq)
+        else:
+            self._toggle(move.piece_moved, end_sq)
+        if move.isEnPassantMove:
+            self._toggle(move.piece_captured, move.start_row*8 + move.end_col)
+        elif move.piece_captured != "--":
+            self._toggle(move.piece_captured, end_sq)
+        if move.isCastleMove:
+            rook = move.piece_moved[0] + 'R'
+            row = move.end_row*8
+            if move.end_col == 6:
+                self._toggle(rook, row + 7)
+                self._toggle(rook, row + 5)
+            else:
+                self._toggle(rook, row)
+                self._toggle(rook, row + 3)
+
+    def makeMove(self, move):
+        super().makeMove(move)
+        self._toggleMove(move)
+
+    def undoMove(self):
+        if len(self.moveLog) == 0:
+            return
+        move = self.moveLog[-1]
+        super().undoMove()
+        self._toggleMove(move)
+
+    # --------------- attack tests ----------------
+    def attackersTo(self, sq, color, occupied):
+        """Bitboard of `color` pieces attacking sq, given the occupancy `occupied`."""
+        bb = self.bitboards
+        attackers = (KNIGHT_BB[sq] & bb[color + 'N']) | (KING_BB[sq] & bb[color + 'K'])
+        # a pawn of `color` attacks sq from the squares an opposite-colored pawn on sq would attack
+        attackers |= PAWN_ATTACK_BB['b' if color == 'w' else 'w'][sq] & bb[color + 'p']
+        rooks = bb[color + 'R'] | bb[color + 'Q']
+        if rooks:
+            attackers |= slidingAttacks(sq, occupied, 0, 4) & rooks
+        bishops = bb[color + 'B'] | bb[color + 'Q']
+        if bishops:
+            attackers |= slidingAttacks(sq, occupied, 4, 8) & bishops
+        return attackers
+
+    def attackedSquares(self, color, occupied):
+        """Bitboard of every square attacked by `color`, given the occupancy `occupied`."""
+        bb = self.bitboards
+        pawns = bb[color + 'p']
+        if color == 'w':
+            attacks = ((pawns & ~FILE_A_BB) >> 9) | ((pawns & ~FILE_H_BB) >> 7)
+        else:
+            attacks = (((pawns & ~FILE_A_BB) << 7) | ((pawns & ~FILE_H_BB) << 9)) & FULL_BB
+        for piece, table in (('N', KNIGHT_BB), ('K', KING_BB)):
+            pieces = bb[color + piece]
+            while pieces:
+                lsb = pieces & -pieces
+                attacks |= table[lsb.bit_length() - 1]
+                pieces ^= lsb
+        for piece, first, last in (('R', 0, 4), ('B', 4, 8), ('Q', 0, 8)):
+            pieces = bb[color + piece]
+            while pieces:
+                lsb = pieces & -pieces
+                attacks |= slidingAttacks(lsb.bit_length() - 1, occupied, first, last)
+                pieces ^= lsb
+        return attacks
+
+    def _computeAttackMap(self, color):
+        enemy_king = self.bitboards[('b' if color == 'w' else 'w') + 'K']
+        return self.attackedSquares(color, self.allOccupancy ^ enemy_king)
+
+    def _occupiedBits(self):
+        return self.allOccupancy
+
+    def seeAttackers(self, sq, occupied):
+        bb = self.bitboards
+        attackers = (KNIGHT_BB[sq] & (bb['wN'] | bb['bN'])) | (KING_BB[sq] & (bb['wK'] | bb['bK'])) | \
+            (PAWN_ATTACK_BB['b'][sq] & bb['wp']) | (PAWN_ATTACK_BB['w'][sq] & bb['bp'])
+        queens = bb['wQ'] | bb['bQ']
+        rooks = (bb['wR'] | bb['bR'] | queens) & occupied
+        if rooks:
+            attackers |= slidingAttacks(sq, occupied, 0, 4) & rooks
+        bishops = (bb['wB'] | bb['bB'] | queens) & occupied
+        if bishops:
+            attackers |= slidingAttacks(sq, occupied, 4, 8) & bishops
+        return attackers
+
+    def _leastValuableAttacker(self, attackers, color):
+        bb = self.bitboards
+        for piece in SEE_ORDER:
+            pieces = attackers & bb[color + piece]
+            if pieces:
+                return pieces & -pieces, piece
+        return 0, None
+
+    def squareUnderAttack(self, r, c, ally_color=None):
+        if ally_color is None:
+            ally_color = 'w' if self.whiteToMove else 'b'
+        enemy_color = 'w' if ally_color == 'b' else 'b'
+        return self.attackersTo(r*8 + c, enemy_color, self.allOccupancy) != 0
+
+    def inCheck(self):
+        ally = 'w' if self.whiteToMove else 'b'
+        king_sq = self.bitboards[ally + 'K'].bit_length() - 1
+        return self.attackersTo(king_sq, 'b' if ally == 'w' else 'w', self.allOccupancy) != 0
+
+    # --------------- legal move generation ----------------
+    def _pinnedPieces(self, king_sq, ally, enemy, occupied):
+        """Bitboard of ally pieces pinned against their king."""
+        bb = self.bitboards
+        snipers = slidingAttacks(king_sq, 0, 0, 4) & (bb[enemy + 'R'] | bb[enemy + 'Q'])
+        snipers |= slidingAttacks(king_sq, 0, 4, 8) & (bb[enemy + 'B'] | bb[enemy + 'Q'])
+        pinned = 0
+        while snipers:
+            lsb = snipers & -snipers
+            snipers ^= lsb
+            blockers = BETWEEN_BB[king_sq][lsb.bit_length() - 1] & occupied
+            if blockers and not blockers & (blockers - 1):
+                pinned |= blockers & self.occupancy[ally]
+        return pinned
+
+    def _checkList(self, king_sq, checkers):
+        """The checkers bitboard as GameState.checks entries (row, col, d_row, d_col), direction from the king."""
+        king_row, king_col = SQ_TO_RC[king_sq]
+        checks = []
+        while checkers:
+            lsb = checkers & -checkers
+            checkers ^= lsb
+            check_row, check_col = SQ_TO_RC[lsb.bit_length() - 1]
+            d_row, d_col = check_row - king_row, check_col - king_col
+            if self.board[check_row][check_col][1] != 'N':
+                d_row, d_col = (d_row > 0) - (d_row < 0), (d_col > 0) - (d_col < 0)
+            checks.append((check_row, check_col, d_row, d_col))
+        return checks
+
+    def _addMoves(self, start_sq, targets, moves):
+        start = SQ_TO_RC[start_sq]
+        while targets:
+            lsb = targets & -targets
+            targets ^= lsb
+            moves.append(Move(start, SQ_TO_RC[lsb.bit_length() - 1], self.board))
+
+    def generateLegalMoves(self, captures=True, quiets=True, square=None):
+        """
+        Generate only legal moves: king moves avoid every square the enemy attacks (computed with our
+        king removed), other pieces are restricted to the check-block mask and to their pin line.
+        `captures`, `quiets` and `square` select moves as in GameState.generateLegalMoves.
+        """
+        ally, enemy = ('w', 'b') if self.whiteToMove else ('b', 'w')
+        bb = self.bitboards
+        own = self.occupancy[ally]
+        occupied = self.allOccupancy
+        king_bb = bb[ally + 'K']
+        king_sq = king_bb.bit_length() - 1
+        pieces_mask = FULL_BB if square is None else 1 << (square[0]*8 + square[1])
+        # destination squares of the requested kinds (pawns sort out their own promotions)
+        wanted = (self.occupancy[enemy] if captures else 0) | (~occupied if quiets else 0)
+        moves = []
+
+        checkers = self.attackersTo(king_sq, enemy, occupied)
+        self.checks = self._checkList(king_sq, checkers)
+        if king_bb & pieces_mask:
+            danger = self.attackMap(enemy)
+            self._addMoves(king_sq, KING_BB[king_sq] & wanted & ~danger, moves)
+            if not checkers and quiets:
+                self._addCastleMoves(king_sq, ally, occupied, danger, moves)
+
+        if checkers & (checkers - 1):
+            target_mask = 0  # double check: only the king may move
+        elif checkers:
+            target_mask = checkers | BETWEEN_BB[king_sq][checkers.bit_length() - 1]
+        else:
+            target_mask = FULL_BB
+
+        if target_mask and pieces_mask & own & ~king_bb:
+            pinned = self._pinnedPieces(king_sq, ally, enemy, occupied)
+            not_own = wanted & target_mask
+            pieces = bb[ally + 'N'] & ~pinned & pieces_mask  # a pinned knight can never move
+            while pieces:
+                lsb = pieces & -pieces
+                pieces ^= lsb
+                sq = lsb.bit_length() - 1
+                self._addMoves(sq, KNIGHT_BB[sq] & not_own, moves)
+            for piece, first, last in (('B', 4, 8), ('R', 0, 4), ('Q', 0, 8)):
+                pieces = bb[ally + piece] & pieces_mask
+                while pieces:
+                    lsb = pieces & -pieces
+                    pieces ^= lsb
+                    sq = lsb.bit_length() - 1
+                    targets = slidingAttacks(sq, occupied, first, last) & not_own
+                    if lsb & pinned:
+                        targets &= LINE_BB[king_sq][sq]
+                    self._addMoves(sq, targets, moves)
+            self._addPawnMoves(king_sq, ally, enemy, pinned, checkers, target_mask, moves,
+                               bb[ally + 'p'] & pieces_mask, captures, quiets)
+        return moves
+
+    def _addPawnMoves(self, king_sq, ally, enemy, pinned, checkers, target_mask, moves,
+                      pawns, captures=True, quiets=True):
+        occupied = self.allOccupancy
+        opp = self.occupancy[enemy]
+        forward, start_row = (-8, 6) if ally == 'w' else (8, 1)
+        ep_sq = self.enpassantPossible[0]*8 + self.enpassantPossible[1] if self.enpassantPossible else -1
+        # promotions count as captures; every other pawn push is a quiet move
+        if captures:
+            wanted = FULL_BB if quiets else PROMOTION_RANKS_BB | opp
+        else:
+            wanted = ~PROMOTION_RANKS_BB & ~opp if quiets else 0
+        while pawns:
+            lsb = pawns & -pawns
+            pawns ^= lsb
+            sq = lsb.bit_length() - 1
+            line = LINE_BB[king_sq][sq] if lsb & pinned else FULL_BB
+            targets = PAWN_ATTACK_BB[ally][sq] & opp
+            one = sq + forward
+            if not (occupied >> one) & 1:
+                targets |= 1 << one
+                if sq >> 3 == start_row and not (occupied >> (one + forward)) & 1:
+                    targets |= 1 << (one + forward)
+            targets &= target_mask & line & wanted
+            if targets & PROMOTION_RANKS_BB:
+                start = SQ_TO_RC[sq]
+                while targets:
+                    lsb = targets & -targets
+                    targets ^= lsb
+                    self.addPawnMove(start, SQ_TO_RC[lsb.bit_length() - 1], moves)
+            else:
+                self._addMoves(sq, targets, moves)
+
+            if captures and ep_sq >= 0 and (PAWN_ATTACK_BB[ally][sq] >> ep_sq) & 1 and (line >> ep_sq) & 1:
+                captured_sq = ep_sq - forward
+                # the capture must resolve any check (the checker may be the pawn being taken) ...
+                if (target_mask >> ep_sq) & 1 or (checkers >> captured_sq) & 1:
+                    # ... and must not expose the king once both pawns leave their squares
+                    after = (occupied ^ (1 << sq) ^ (1 << captured_sq)) | (1 << ep_sq)
+                    bb = self.bitboards
+                    if not (slidingAttacks(king_sq, after, 0, 4) & (bb[enemy + 'R'] | bb[enemy + 'Q'])) and \
+                       not (slidingAttacks(king_sq, after, 4, 8) & (bb[enemy + 'B'] | bb[enemy + 'Q'])):
+                        moves.append(Move(SQ_TO_RC[sq], SQ_TO_RC[ep_sq], self.board, isEnPassantMove=True))
+
+    def _addCastleMoves(self, king_sq, ally, occupied, danger, moves):
+        rights = self.castlingRights
+        start = SQ_TO_RC[king_sq]
+        if rights & (WKS if ally == 'w' else BKS):
+            path = (1 << (king_sq + 1)) | (1 << (king_sq + 2))
+            if not path & occupied and not path & danger:
+                moves.append(Move(start, SQ_TO_RC[king_sq + 2], self.board, isCastleMove=True))
+        if rights & (WQS if ally == 'w' else BQS):
+            empty = (1 << (king_sq - 1)) | (1 << (king_sq - 2)) | (1 << (king_sq - 3))
+            path = (1 << (king_sq - 1)) | (1 << (king_sq - 2))
+            if not empty & occupied and not path & danger:
+                moves.append(Move(start, SQ_TO_RC[king_sq - 2], self.board, isCastleMove=True))
@@ -12,6 +12,12 @@ DIMENSION = 8
 SQ_SIZE = HEIGHT // DIMENSION
 MAX_FPS = 15
 IMAGES = {}
+BITBOARD_BACKEND = False  # BitboardGameState keeps the mailbox board too, so it is slower in search; kept for comparison
+AI_THINK_TIME = 0.5  # seconds the AI may think per move
+AI_TABLE_MEGABYTES = 16  # memory cap of the AI's transposition table (kept between moves)
+AI_PONDER = True  # keep searching the expected reply during the human's turn
+AI_PRINT_INFO = False  # print a UCI-style info line for each depth the AI completes
+AI_TIME_SLICED = False  # think in short slices between frames instead of in a separate process (single-core boxes)
 colors = [p.Color(245, 245, 245) , p.Color(181, 136, 99)]
 
 
@@ -62,6 +68,12 @@ def highlightSquares(screen , gs , validMoves , sqSelected):
                     screen.blit(s,(move.end_col*SQ_SIZE , move.end_row*SQ_SIZE))
 
 
+def newGameState():
+    if BITBOARD_BACKEND:
+        return ChessEngine.BitboardGameState()
+    return ChessEngine.GameState()
+
+
 """
 The main driver for our code. This will handle user input and updating the graphics
 """
@@ -70,9 +82,15 @@ def main():
     p.display.set_caption("Chess")
     clock = p.time.Clock()
     screen.fill(p.Color("white"))
-    gs = ChessEngine.GameState()
+    gs = newGameState()
     validMoves = gs.getValidMoves()
     moveMade = False
+    # the AI searches in its own process, or a slice per frame, so the window keeps drawing and handling events
+    aiInfo = (lambda stats: print(stats.infoLine())) if AI_PRINT_INFO else None
+    if AI_TIME_SLICED:
+        aiSearch = SmartMoveFinder.SlicedSearch(AI_THINK_TIME, AI_TABLE_MEGABYTES, info=aiInfo)
+    else:
+        aiSearch = SmartMoveFinder.BackgroundSearch(AI_THINK_TIME, AI_TABLE_MEGABYTES, info=aiInfo)
 
     load_Images() #only do this once before the while loop
 
@@ -123,23 +141,34 @@ def main():
             #key handler
             elif e.type == p.KEYDOWN:
                 if e.key == p.K_z:
+                    aiSearch.cancel()  # the position it was searching is gone
                     gs.undoMove()
                     validMoves = gs.getValidMoves()
                     moveMade = True
                 elif e.key == p.K_r:  # restart game
-                    gs = ChessEngine.GameState()  # reset board
+                    aiSearch.cancel()
+                    gs = newGameState()  # reset board
                     validMoves = gs.getValidMoves()
                     sq_Selected = ()
                     player_clicks = []
                     moveMade = False
-        # Ai move finder
+        # undo or restart may have changed whose turn it is since the top of the frame
+        humanTurn = (gs.whiteToMove and playerOne) or (not gs.whiteToMove and playerTwo)
+        # Ai move finder: start a search, then each frame advance it / check whether it has finished
         if not gameOver and not humanTurn:
-            AIMove = SmartMoveFinder.findBestMoveMinMax(gs , validMoves)
-            if AIMove is None:
-                AIMove = SmartMoveFinder.findRandomMove(validMoves)
-            if AIMove is not None:
-                gs.makeMove(AIMove)
-                moveMade = True
+            if not aiSearch.thinking:
+                aiSearch.start(gs)
+            else:
+                result = aiSearch.poll(gs)
+                if result is not None:
+                    AIMove = result.move
+                    if AIMove is None:
+                        AIMove = SmartMoveFinder.findRandomMove(validMoves)
+                    if AIMove is not None:
+                        gs.makeMove(AIMove)
+                        moveMade = True
+                        if AI_PONDER:
+                            aiSearch.ponder(gs)
             #animation(AIMove, screen, gs.board, clock)
         if moveMade:
             animation(gs.moveLog[-1], screen, gs.board, clock)
@@ -160,6 +189,7 @@ def main():
 
         clock.tick(MAX_FPS)
         p.display.flip()
+    aiSearch.close()
     p.quit()
 
 
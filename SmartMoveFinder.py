@@ -1,11 +1,43 @@
 # SmartMoveFinder.py
+import copy
+import multiprocessing
+import os
+import queue
 import random
+import threading
+import time
+from Chess import ChessEngine
+from Chess.ChessTables import KING_BB
+from Chess.TranspositionTable import TranspositionTable, EXACT, LOWER, UPPER, DEFAULT_MEGABYTES
 
 # piece values
 pieceScore = {'p': 1, 'B': 3, 'N': 3, 'K': 0, 'Q': 10, 'R': 5}
 checkMate = 1000
 staleMate = 0
-DEPTH = 2  # default search depth (adjust as you like)
+DEPTH = 2  # default search depth (adjust as you like); quiescence search resolves captures past it
+mobilityWeight = 0.05  # per square a side attacks
+kingZoneWeight = 0.1  # per enemy-attacked square next to a king
+INFINITY = float('inf')
+TIME_LIMIT = 0.5  # default thinking time per move in seconds for iterative deepening
+MAX_DEPTH = 32  # deepest iteration iterative deepening will start
+LIMIT_CHECK_NODES = 256  # how often (in nodes) the search checks its time and node limits
+SLICE_TIME = 0.01  # seconds a time-sliced search runs per step
+SLICE_CHECK_NODES = 16  # limit check interval of a time-sliced search, fine enough to keep slices short
+ASPIRATION_WINDOW = 0.5  # half-width of the first root window around the previous iteration's score
+ASPIRATION_LIMIT = 8  # a window that has to widen past this many pawns is opened fully
+NULL_WINDOW = 0.001  # width of PVS scout windows; evaluation steps are far coarser than this
+NULL_MOVE_REDUCTION = 2  # extra plies a null-move search is reduced by
+NULL_MOVE_MIN_DEPTH = 3  # shallowest remaining depth that tries a null move
+LMR_MIN_DEPTH = 3  # shallowest remaining depth that reduces late moves
+LMR_MIN_INDEX = 3  # quiet moves from this index on are reduced by one ply ...
+LMR_DEEP_INDEX = 8  # ... and from this one on by two
+FUTILITY_DEPTH = 2  # futility and reverse futility pruning apply at this remaining depth and below
+FUTILITY_MARGIN = 2  # pawns per ply of depth a quiet move is assumed able to gain at most
+REVERSE_FUTILITY_MARGIN = 1.5  # pawns per ply of depth the opponent is assumed able to win back
+PRUNING_COUNTERS = ('nullMove', 'lateMoveReductions', 'lateMoveResearches', 'futility', 'reverseFutility')
+MATE_THRESHOLD = checkMate - 500  # scores beyond this are mates, stored relative to the node in the table
+DELTA_MARGIN = 2  # quiescence skips captures that cannot lift the score within this much of alpha
+MAX_PLY = 64  # hard cap on search ply, reached only by long chains of checks in quiescence
 
 
 def findRandomMove(validMoves):
@@ -29,6 +61,29 @@ def scoreMaterial(board):
     return score
 
 
+def scorePieces(gs):
+    """Material score from the GameState piece lists, visiting only occupied squares."""
+    score = 0
+    board = gs.board
+    for r, c in gs.pieceSquares['w']:
+        score += pieceScore[board[r][c][1]]
+    for r, c in gs.pieceSquares['b']:
+        score -= pieceScore[board[r][c][1]]
+    return score
+
+
+def scoreActivity(gs):
+    """Mobility and king safety from the GameState's cached attack maps. Positive favors white."""
+    white = gs.attackMap('w')
+    black = gs.attackMap('b')
+    score = mobilityWeight * (white.bit_count() - black.bit_count())
+    r, c = gs.whiteKingLocation
+    score -= kingZoneWeight * (black & KING_BB[r*8 + c]).bit_count()
+    r, c = gs.blackKingLocation
+    score += kingZoneWeight * (white & KING_BB[r*8 + c]).bit_count()
+    return score
+
+
 def scoreBoard(gs):
     """
     Evaluate the current game state.
@@ -44,76 +99,1001 @@ def scoreBoard(gs):
             return checkMate
     if gs.staleMate:
         return staleMate
-    # Otherwise return material score
-    return scoreMaterial(gs.board)
+    # Otherwise return material plus mobility and king safety
+    return scorePieces(gs) + scoreActivity(gs)
+
 
+class IterationStats:
+    """One completed depth of a search: its score, best move and line, and the time and nodes spent so far."""
+    def __init__(self, depth, score, pv, time, nodes):
+        self.depth = depth
+        self.score = score
+        self.move = pv[0] if pv else None
+        self.pv = list(pv)
+        self.time = time
+        self.nodes = nodes
 
-def minimax(gs, depth):
+
+class SearchStats:
     """
-    Simple minimax that returns evaluation score.
-    Uses gs.whiteToMove to decide maximizing or minimizing at each node.
+    Counters of one search, for seeing where its time goes: nodes (quiescence nodes included) and
+    qnodes, elapsed time, beta cutoffs and how many came from the first move searched, transposition
+    table probes, hits and stores, how often each pruning technique fired, and an IterationStats per
+    completed depth. pv is the principal variation of the last completed depth.
     """
-    if depth == 0:
-        return scoreBoard(gs)
+    def __init__(self):
+        self.nodes = 0
+        self.qnodes = 0
+        self.time = 0.0
+        self.cutoffs = 0
+        self.firstMoveCutoffs = 0
+        self.ttProbes = 0
+        self.ttHits = 0
+        self.ttStores = 0
+        self.hashfull = 0
+        self.pruning = dict.fromkeys(PRUNING_COUNTERS, 0)
+        self.iterations = []
+        self.pv = []
 
-    moves = gs.getValidMoves()
-    if not moves:
-        # no legal moves: scoreBoard already handles checkmate/stalemate
-        return scoreBoard(gs)
+    @property
+    def nps(self):
+        return int(self.nodes / self.time) if self.time > 0 else 0
 
-    if gs.whiteToMove:
-        maxScore = -float('inf')
-        for move in moves:
-            gs.makeMove(move)
-            score = minimax(gs, depth - 1)
-            gs.undoMove()
-            if score > maxScore:
-                maxScore = score
-        return maxScore
-    else:
-        minScore = float('inf')
-        for move in moves:
-            gs.makeMove(move)
-            score = minimax(gs, depth - 1)
-            gs.undoMove()
-            if score < minScore:
-                minScore = score
-        return minScore
+    @property
+    def firstMoveCutoffRate(self):
+        return self.firstMoveCutoffs / self.cutoffs if self.cutoffs else 0.0
 
+    @property
+    def ttHitRate(self):
+        return self.ttHits / self.ttProbes if self.ttProbes else 0.0
 
-def findBestMoveMinMax(gs, validMoves, depth=DEPTH):
+    def merge(self, other):
+        """Add the counters of another search (a root-parallel task) to these."""
+        self.nodes += other.nodes
+        self.qnodes += other.qnodes
+        self.cutoffs += other.cutoffs
+        self.firstMoveCutoffs += other.firstMoveCutoffs
+        self.ttProbes += other.ttProbes
+        self.ttHits += other.ttHits
+        self.ttStores += other.ttStores
+        for name, count in other.pruning.items():
+            self.pruning[name] = self.pruning.get(name, 0) + count
+
+    def infoLine(self):
+        """The last completed depth as a UCI `info` line (scores in centipawns, or mate in moves)."""
+        if not self.iterations:
+            return "info nodes %d nps %d time %d" % (self.nodes, self.nps, self.time * 1000)
+        last = self.iterations[-1]
+        if abs(last.score) >= MATE_THRESHOLD:
+            plies = checkMate - abs(last.score)
+            score = "mate %d" % ((plies + 1) // 2 if last.score > 0 else -(plies // 2))
+        else:
+            score = "cp %d" % round(last.score * 100)
+        return "info depth %d score %s nodes %d nps %d time %d hashfull %d pv %s" % (
+            last.depth, score, last.nodes, self.nps, last.time * 1000, self.hashfull,
+            " ".join(move.get_chess_notation() for move in last.pv))
+
+
+class SearchResult:
     """
-    Root-level function to pick best move using minimax (fixed depth).
-    Returns the best Move object (or None if no moves).
+    Outcome of a search: the best move, its score for the side to move, the deepest completed
+    depth, the nodes visited, the principal variation (expected line of play), the share of
+    beta cutoffs produced by the first move searched, how often each pruning technique fired and
+    the full SearchStats.
     """
-    if not validMoves:
-        return None
+    def __init__(self, move, score, depth, nodes, pv=(), firstMoveCutoffRate=0.0, pruning=None, stats=None):
+        self.move = move
+        self.score = score
+        self.depth = depth
+        self.nodes = nodes
+        self.pv = list(pv)
+        self.firstMoveCutoffRate = firstMoveCutoffRate
+        self.pruning = dict(pruning or {})
+        self.stats = stats if stats is not None else SearchStats()
 
-    isWhiteToMove = gs.whiteToMove
-    bestMove = None
 
-    if isWhiteToMove:
-        bestScore = -float('inf')
-        for move in validMoves:
-            gs.makeMove(move)
-            score = minimax(gs, depth - 1)
+class MoveOrdering:
+    """
+    Search-wide move ordering state. The hash move and MVV-LVA captures come from
+    GameState.getStagedMoves; this class adds two killer slots per ply (quiet moves that recently
+    caused a cutoff at that ply) and a butterfly history table per side (cutoff credit by from/to
+    square, weighted by depth squared) that orders the remaining quiet moves. It also counts how
+    often a cutoff came from the first move searched, the usual measure of ordering quality.
+    """
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.killers = [[None, None] for _ in range(MAX_PLY + 1)]
+        self.history = ([0] * 4096, [0] * 4096)  # [white, black][move_id & 0xFFF]
+        self.cutoffs = 0
+        self.firstMoveCutoffs = 0
+
+    def stagedMoves(self, gs, ply, hashMove=None):
+        return gs.getStagedMoves(hashMove, self.killers[ply], self.history[0 if gs.whiteToMove else 1])
+
+    def recordCutoff(self, gs, move, ply, depth, moveIndex):
+        """Credit a beta cutoff by the `moveIndex`-th move searched (0 = first)."""
+        self.cutoffs += 1
+        if moveIndex == 0:
+            self.firstMoveCutoffs += 1
+        if move.piece_captured == "--" and not move.isPawnPromotion:
+            killers = self.killers[ply]
+            if killers[0] != move.move_id:
+                killers[1] = killers[0]
+                killers[0] = move.move_id
+            self.history[0 if gs.whiteToMove else 1][move.move_id & 0xFFF] += depth * depth
+
+    def firstMoveCutoffRate(self):
+        return self.firstMoveCutoffs / self.cutoffs if self.cutoffs else 0.0
+
+
+class Searcher:
+    """
+    Fail-soft negamax alpha-beta search. Scores are from the side to move's point of view, mates
+    are scored checkMate minus the distance in plies so shorter mates are preferred, and moves come
+    from GameState.getStagedMoves so a cutoff skips generating the later stages.
+
+    timeLimit (seconds) and nodeLimit stop the search; they are checked every checkInterval
+    (LIMIT_CHECK_NODES) nodes, and a stopped iteration is discarded. `table` is the TranspositionTable to use; pass the
+    same one for every move of a game so it carries over between searches.
+
+    pvs switches principal variation search on (scout every move after the first with a null window)
+    and aspiration switches on root aspiration windows in iterative deepening; turning both off gives
+    plain alpha-beta for comparison. nullMove, lmr (late-move reductions), futility and
+    reverseFutility switch the selective techniques; self.pruning counts how often each one fired,
+    and pruningSavings() measures the nodes each one saves. stopCheck, if set, is a function polled
+    with the limits that returns True to stop the search early (for cancellation).
+
+    Every result carries the SearchStats of its search. `info`, if given, is called with those stats
+    after each completed depth, to stream progress live the way a UCI engine sends `info` lines.
+    """
+    def __init__(self, timeLimit=None, nodeLimit=None, table=None, pvs=True, aspiration=True,
+                 nullMove=True, lmr=True, futility=True, reverseFutility=True, info=None):
+        self.timeLimit = timeLimit
+        self.nodeLimit = nodeLimit
+        self.pvs = pvs
+        self.aspiration = aspiration
+        self.nullMove = nullMove
+        self.lmr = lmr
+        self.futility = futility
+        self.reverseFutility = reverseFutility
+        self.info = info
+        self.pruning = dict.fromkeys(PRUNING_COUNTERS, 0)
+        self.stopCheck = None
+        self.checkInterval = LIMIT_CHECK_NODES
+        self.table = table if table is not None else TranspositionTable()
+        self.ordering = MoveOrdering()
+        self.nodes = 0
+        self.qnodes = 0
+        self.stopped = False
+        self.startTime = 0.0
+        self.deadline = None
+        self.previousPv = []
+        self.stats = SearchStats()
+        self.statsBase = (0, 0, 0, 0, 0)
+
+    def _start(self, newPosition=True):
+        """Reset the counters and limits; a new position also ages the table and clears the ordering state."""
+        self.nodes = 0
+        self.qnodes = 0
+        self.stopped = False
+        self.startTime = time.perf_counter()
+        self.deadline = self.startTime + self.timeLimit if self.timeLimit is not None else None
+        self.pruning = dict.fromkeys(PRUNING_COUNTERS, 0)
+        if newPosition:
+            self.previousPv = []
+            self.table.newSearch()
+            self.ordering.clear()
+        # the ordering and table counters run across searches; the stats report the change from here
+        self.stats = SearchStats()
+        self.statsBase = (self.ordering.cutoffs, self.ordering.firstMoveCutoffs,
+                          self.table.probes, self.table.hits, self.table.stores)
+
+    def updateStats(self):
+        """Bring self.stats up to date with the counters; returns it."""
+        stats = self.stats
+        cutoffs, firstMoveCutoffs, probes, hits, stores = self.statsBase
+        stats.nodes = self.nodes
+        stats.qnodes = self.qnodes
+        stats.time = time.perf_counter() - self.startTime
+        stats.cutoffs = self.ordering.cutoffs - cutoffs
+        stats.firstMoveCutoffs = self.ordering.firstMoveCutoffs - firstMoveCutoffs
+        stats.ttProbes = self.table.probes - probes
+        stats.ttHits = self.table.hits - hits
+        stats.ttStores = self.table.stores - stores
+        stats.pruning = dict(self.pruning)
+        return stats
+
+    def completeIteration(self, depth, score, pv):
+        """Record a completed depth in the stats and report it to the info callback."""
+        stats = self.updateStats()
+        stats.iterations.append(IterationStats(depth, score, pv, stats.time, self.nodes))
+        stats.pv = list(pv)
+        stats.hashfull = self.table.hashfull()
+        if self.info is not None:
+            self.info(stats)
+
+    def checkLimits(self):
+        if self.nodeLimit is not None and self.nodes >= self.nodeLimit:
+            self.stopped = True
+        elif self.deadline is not None and time.perf_counter() >= self.deadline:
+            self.stopped = True
+        elif self.stopCheck is not None and self.stopCheck():
+            self.stopped = True
+
+    def search(self, gs, validMoves, depth=DEPTH):
+        """Search every root move to `depth` plies and return a SearchResult."""
+        self._start()
+        moves = list(validMoves)
+        random.shuffle(moves)  # vary the choice between equally scored moves
+        score, pv = self.searchRoot(gs, moves, depth)
+        if pv and not self.stopped:
+            self.completeIteration(depth, score, pv)
+        return SearchResult(pv[0] if pv else None, score, depth, self.nodes, pv,
+                            self.ordering.firstMoveCutoffRate(), self.pruning, self.updateStats())
+
+    def iterativeDeepening(self, gs, validMoves, maxDepth=MAX_DEPTH):
+        """
+        Search depth 1, 2, ... until maxDepth or a limit is hit, and return the result of the last
+        completed iteration. Each iteration searches the previous principal variation first.
+        """
+        self._start()
+        moves = list(validMoves)
+        random.shuffle(moves)  # vary the choice between equally scored moves
+        entry = self.table.probe(gs.zobristKey)
+        if entry is not None:
+            # start with the best move remembered from an earlier search of this position
+            for move in moves:
+                if move.move_id == entry[3]:
+                    moves.remove(move)
+                    moves.insert(0, move)
+                    break
+        result = SearchResult(moves[0] if moves else None, 0, 0, 0)
+        for depth in range(1, maxDepth + 1):
+            if self.aspiration and result.depth > 0 and abs(result.score) < MATE_THRESHOLD:
+                score, pv = self.aspirationSearch(gs, moves, depth, result.score)
+            else:
+                score, pv = self.searchRoot(gs, moves, depth)
+            if self.stopped or not pv:
+                if result.depth == 0 and pv:
+                    # not even depth 1 finished: the root moves already searched beat a blind pick
+                    result = SearchResult(pv[0], score, 0, self.nodes, pv)
+                break
+            result = SearchResult(pv[0], score, depth, self.nodes, pv)
+            self.table.store(gs.zobristKey, depth, score, EXACT, pv[0].move_id)
+            self.completeIteration(depth, score, pv)
+            self.previousPv = pv
+            moves.remove(pv[0])
+            moves.insert(0, pv[0])
+            if abs(score) >= checkMate - depth:
+                break  # a forced mate within this depth cannot get shorter
+        result.nodes = self.nodes
+        result.firstMoveCutoffRate = self.ordering.firstMoveCutoffRate()
+        result.pruning = dict(self.pruning)
+        result.stats = self.updateStats()
+        return result
+
+    def aspirationSearch(self, gs, moves, depth, guess):
+        """
+        Search the root in a window of ASPIRATION_WINDOW around `guess`, the previous iteration's score.
+        A score outside the window widens the side it failed on, doubling each time, and searches again.
+        """
+        delta = ASPIRATION_WINDOW
+        alpha, beta = guess - delta, guess + delta
+        while True:
+            score, pv = self.searchRoot(gs, moves, depth, alpha, beta)
+            if self.stopped or alpha < score < beta:
+                return score, pv
+            delta *= 2
+            if score <= alpha:
+                alpha = score - delta if delta < ASPIRATION_LIMIT else -INFINITY
+            else:
+                beta = score + delta if delta < ASPIRATION_LIMIT else INFINITY
+
+    def searchRoot(self, gs, moves, depth, alpha=-INFINITY, beta=INFINITY):
+        """Search the root moves in the given order; returns (score, principal variation)."""
+        bestScore = -INFINITY
+        bestPv = []
+        for moveIndex, move in enumerate(moves):
+            childPv = []
+            followPv = bool(self.previousPv) and move == self.previousPv[0]
+            score = self.searchMove(gs, move, depth, alpha, beta, 0, childPv, followPv, moveIndex, True)
+            if self.stopped:
+                break
+            if score > bestScore:
+                bestScore = score
+                bestPv = [move] + childPv
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        break  # fail high: the aspiration window was too low
+        return bestScore, bestPv
+
+    def searchSharedRootMove(self, gs, move, depth, sharedAlpha):
+        """
+        Search one root move for a root-parallel search. The window starts at the best score any process
+        has found so far, sharedAlpha (a multiprocessing.Value), which is raised when this move beats it.
+        Returns (score, pv, exact); exact is False when the move failed low and score is only an upper bound.
+        """
+        alpha = sharedAlpha.value
+        pv = []
+        score = self.searchMove(gs, move, depth, alpha, INFINITY, 0, pv, False, 0 if alpha == -INFINITY else 1, True)
+        if not self.stopped and score > alpha:
+            with sharedAlpha.get_lock():
+                if score > sharedAlpha.value:
+                    sharedAlpha.value = score
+        return score, [move] + pv, score > alpha
+
+    def searchMove(self, gs, move, depth, alpha, beta, ply, pv, followPv, moveIndex, pvNode=False, reduction=0,
+                   prunable=False):
+        """
+        Make `move` at `ply`, search the reply to depth - 1 and undo it; returns the score for the side
+        that moved. With PVS every move after the first is scouted with a null window just above alpha
+        and searched again with the full window only if it beats alpha. pvNode tells whether the node
+        making the move is on the principal variation; its first move, and a full-window re-search,
+        lead to a PV node too, and every other reply is searched as a non-PV node. A late-move `reduction` scouts
+        that many plies shallower first and re-searches at full depth if the move beats alpha; a
+        `prunable` move is skipped (None is returned). Moves that give check are never reduced or pruned.
+        """
+        gs.makeMove(move)
+        if (reduction or prunable) and gs.inCheck():
+            reduction = 0
+            prunable = False
+        if prunable:
             gs.undoMove()
-            # prefer higher score for white
-            if score > bestScore or (score == bestScore and random.random() < 0.5):
+            return None
+        if moveIndex == 0 or not (self.pvs or reduction):
+            score = -self.negamax(gs, depth - 1, -beta, -alpha, ply + 1, pv, followPv,
+                                  pvNode=pvNode and moveIndex == 0)
+        else:
+            scoutAlpha = -alpha - NULL_WINDOW if self.pvs else -beta
+            score = -self.negamax(gs, depth - 1 - reduction, scoutAlpha, -alpha, ply + 1, pv, followPv)
+            if reduction:
+                self.pruning['lateMoveReductions'] += 1
+                if score > alpha and not self.stopped:
+                    self.pruning['lateMoveResearches'] += 1
+                    del pv[:]
+                    score = -self.negamax(gs, depth - 1, scoutAlpha, -alpha, ply + 1, pv, followPv)
+            if self.pvs and alpha < score < beta and not self.stopped:
+                del pv[:]
+                score = -self.negamax(gs, depth - 1, -beta, -alpha, ply + 1, pv, followPv, pvNode=pvNode)
+        gs.undoMove()
+        return score
+
+    def negamax(self, gs, depth, alpha, beta, ply, pv, followPv=False, allowNull=True, pvNode=False):
+        """
+        Score of the position for the side to move; `pv` is filled with the best line found.
+        followPv is True while the moves leading here match the previous iteration's principal
+        variation, whose next move is then searched first. allowNull is False right after a null move.
+        pvNode marks nodes on the principal variation (see searchMove), which are never pruned; it
+        is decided by the search structure rather than the window, so pruning also works with pvs off.
+        """
+        self.nodes += 1
+        if self.nodes % self.checkInterval == 0:
+            self.checkLimits()
+        if self.stopped:
+            return 0
+        if gs.isThreefoldRepetition():
+            return staleMate
+        if depth <= 0:
+            return self.quiescence(gs, alpha, beta, ply)
+
+        # a stored result at least this deep settles the node if its bound fits the window
+        key = gs.zobristKey
+        entry = self.table.probe(key)
+        hashMove = None
+        if entry is not None:
+            tableDepth, tableScore, bound, hashMove = entry
+            if tableDepth >= depth:
+                tableScore = scoreFromTable(tableScore, ply)
+                if bound == EXACT or (bound == LOWER and tableScore >= beta) or \
+                   (bound == UPPER and tableScore <= alpha):
+                    return tableScore
+
+        # selective pruning, only off the principal variation and never in check
+        inCheck = gs.inCheck()
+        staticScore = None
+        futile = False
+        if not inCheck and not pvNode:
+            if self.reverseFutility and depth <= FUTILITY_DEPTH:
+                # so far above beta near the leaves that the opponent will not allow this position
+                staticScore = self.evaluate(gs)
+                if staticScore - REVERSE_FUTILITY_MARGIN * depth >= beta:
+                    self.pruning['reverseFutility'] += 1
+                    return staticScore
+            if self.nullMove and allowNull and depth >= NULL_MOVE_MIN_DEPTH and hasPieces(gs):
+                # if passing still fails high, a real move would too (skipped with only pawns left,
+                # where passing may be the best move and zugzwang breaks the assumption)
+                if staticScore is None:
+                    staticScore = self.evaluate(gs)
+                if staticScore >= beta:
+                    gs.makeNullMove()
+                    score = -self.negamax(gs, depth - 1 - NULL_MOVE_REDUCTION, -beta, -beta + NULL_WINDOW,
+                                          ply + 1, [], False, False)
+                    gs.undoNullMove()
+                    if self.stopped:
+                        return 0
+                    if score >= beta:
+                        self.pruning['nullMove'] += 1
+                        return beta if score > MATE_THRESHOLD else score
+            if self.futility and depth <= FUTILITY_DEPTH:
+                # quiet moves cannot lift a score this far below alpha
+                if staticScore is None:
+                    staticScore = self.evaluate(gs)
+                futile = staticScore + FUTILITY_MARGIN * depth <= alpha
+
+        pvMove = None
+        if followPv and ply < len(self.previousPv):
+            pvMove = self.previousPv[ply].move_id
+        killers = self.ordering.killers[ply]
+        alphaOriginal = alpha
+        bestScore = -INFINITY
+        bestMove = None
+        moveIndex = 0
+        for move in self.ordering.stagedMoves(gs, ply, pvMove if pvMove is not None else hashMove):
+            quiet = move.piece_captured == "--" and not move.isPawnPromotion
+            reduction = 0
+            if self.lmr and quiet and not inCheck and depth >= LMR_MIN_DEPTH and moveIndex >= LMR_MIN_INDEX and \
+               move.move_id not in killers:
+                reduction = 1 if moveIndex < LMR_DEEP_INDEX else 2
+            childPv = []
+            score = self.searchMove(gs, move, depth, alpha, beta, ply, childPv,
+                                    pvMove is not None and move.move_id == pvMove, moveIndex, pvNode,
+                                    reduction, futile and quiet and moveIndex > 0)
+            if self.stopped:
+                return 0
+            if score is None:
+                # futility-pruned: the static score stands in for the move
+                self.pruning['futility'] += 1
+                bestScore = max(bestScore, staticScore)
+                continue
+            if score > bestScore:
                 bestScore = score
-                bestMove = move
-    else:
-        bestScore = float('inf')
-        for move in validMoves:
+                if score > alpha:
+                    alpha = score
+                    bestMove = move
+                    pv[:] = [move] + childPv
+                    if alpha >= beta:
+                        self.ordering.recordCutoff(gs, move, ply, depth, moveIndex)
+                        break  # the opponent will avoid this position
+            moveIndex += 1
+        if bestScore == -INFINITY:
+            # no legal moves: checkmated (the sooner the worse) or stalemate
+            bestScore = -(checkMate - ply) if inCheck else staleMate
+            self.table.store(key, depth, scoreToTable(bestScore, ply), EXACT)
+            return bestScore
+
+        if bestScore >= beta:
+            bound = LOWER
+        elif bestScore > alphaOriginal:
+            bound = EXACT
+        else:
+            bound = UPPER
+        self.table.store(key, depth, scoreToTable(bestScore, ply), bound, bestMove.move_id if bestMove else None)
+        return bestScore
+
+    def quiescence(self, gs, alpha, beta, ply):
+        """
+        Search captures and promotions only, so the static score is taken in a quiet position. The side
+        to move may stand pat on the static score; out of check every evasion is searched instead.
+        Delta pruning skips captures that cannot raise the score to alpha even with DELTA_MARGIN to spare,
+        and captures that static exchange evaluation says lose material are skipped.
+        """
+        self.nodes += 1
+        self.qnodes += 1
+        if self.nodes % self.checkInterval == 0:
+            self.checkLimits()
+        if self.stopped:
+            return 0
+        if ply >= MAX_PLY:
+            return self.evaluate(gs)
+
+        inCheck = gs.inCheck()
+        if inCheck:
+            standPat = bestScore = -INFINITY
+            moves = gs.generateLegalMoves()
+        else:
+            standPat = bestScore = self.evaluate(gs)
+            if standPat >= beta:
+                return standPat
+            alpha = max(alpha, standPat)
+            moves = gs.getCaptureMoves()
+
+        for move in moves:
+            if not inCheck:
+                gain = pieceScore[move.piece_captured[1]] if move.piece_captured != "--" else 0
+                if move.isPawnPromotion:
+                    gain += pieceScore[move.promotionPiece] - pieceScore['p']
+                if standPat + gain + DELTA_MARGIN <= alpha:
+                    continue
+                if gs.isLosingCapture(move):
+                    continue
             gs.makeMove(move)
-            score = minimax(gs, depth - 1)
+            score = -self.quiescence(gs, -beta, -alpha, ply + 1)
             gs.undoMove()
-            # prefer lower score for black
-            if score < bestScore or (score == bestScore and random.random() < 0.5):
+            if self.stopped:
+                return 0
+            if score > bestScore:
                 bestScore = score
-                bestMove = move
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        break
+        if bestScore == -INFINITY:
+            return -(checkMate - ply)  # in check with no evasions
+        return bestScore
 
-    return bestMove
+    def evaluate(self, gs):
+        """Static score for the side to move."""
+        score = scorePieces(gs) + scoreActivity(gs)
+        return score if gs.whiteToMove else -score
+
+
+def hasPieces(gs):
+    """True if the side to move has a piece other than king and pawns (null move is unsafe without one)."""
+    board = gs.board
+    for r, c in gs.pieceSquares['w' if gs.whiteToMove else 'b']:
+        if board[r][c][1] in 'NBRQ':
+            return True
+    return False
+
+
+def scoreToTable(score, ply):
+    """Mate scores count plies from the root; the table stores them as plies from the node itself."""
+    if score > MATE_THRESHOLD:
+        return score + ply
+    if score < -MATE_THRESHOLD:
+        return score - ply
+    return score
+
+
+def scoreFromTable(score, ply):
+    if score > MATE_THRESHOLD:
+        return score - ply
+    if score < -MATE_THRESHOLD:
+        return score + ply
+    return score
+
+
+def findBestMoveNegamax(gs, validMoves, depth=DEPTH, table=None, **options):
+    """
+    Alpha-beta negamax search to a fixed depth. Returns a SearchResult (move, score, nodes).
+    `options` are Searcher switches such as pvs=False.
+    """
+    return Searcher(table=table, **options).search(gs, validMoves, depth)
+
+
+def findBestMoveIterative(gs, validMoves, timeLimit=TIME_LIMIT, nodeLimit=None, maxDepth=MAX_DEPTH, table=None,
+                          **options):
+    """
+    Iterative deepening under a time budget (seconds) and/or node budget; None disables a limit.
+    Returns the SearchResult of the deepest completed iteration. `options` are Searcher switches.
+    """
+    return Searcher(timeLimit, nodeLimit, table, **options).iterativeDeepening(gs, validMoves, maxDepth)
+
+
+# ---------- root-parallel search ----------
+# per-process state of a pool worker: its Searcher (whose table lives as long as the worker), the
+# shared alpha and the GameState rebuilt from the last snapshot it was sent
+_worker = {}
+
+
+def _initWorker(sharedAlpha, options):
+    _worker['searcher'] = Searcher(**options)
+    _worker['sharedAlpha'] = sharedAlpha
+    _worker['snapshot'] = None
+
+
+def _searchRootMoveTask(task):
+    """Pool task: search one root move of a snapshot; returns (move_id, score, pv move_ids, exact, stats, stopped)."""
+    gsClass, snapshot, move_id, depth, deadline = task
+    if deadline is not None and time.time() >= deadline:
+        return move_id, -INFINITY, [], False, SearchStats(), True  # out of time before it started
+    searcher = _worker['searcher']
+    newPosition = snapshot != _worker['snapshot']
+    if newPosition:
+        _worker['gs'] = gsClass.fromSnapshot(snapshot)
+        _worker['snapshot'] = snapshot
+    gs = _worker['gs']
+    # the deadline is wall-clock time, which unlike perf_counter is comparable between processes
+    searcher.timeLimit = max(0.0, deadline - time.time()) if deadline is not None else None
+    searcher._start(newPosition)
+    move = next(m for m in gs.generateLegalMoves(square=divmod(move_id & 63, 8)) if m.move_id == move_id)
+    score, pv, exact = searcher.searchSharedRootMove(gs, move, depth, _worker['sharedAlpha'])
+    return move_id, score, [m.move_id for m in pv], exact, searcher.updateStats(), searcher.stopped
+
+
+def movesFromIds(gs, moveIds):
+    """Move objects for a line of move_ids played from the current position (left unchanged)."""
+    moves = []
+    for move_id in moveIds:
+        move = ChessEngine.Move.fromId(move_id, gs.board)
+        moves.append(move)
+        gs.makeMove(move)
+    for _ in moves:
+        gs.undoMove()
+    return moves
+
+
+def resultFits(gs, result):
+    """True if the result's move is legal in gs, i.e. the result was searched from this position."""
+    return result.move is None or any(move.move_id == result.move.move_id for move in gs.getValidMoves())
+
+
+class ParallelSearcher:
+    """
+    Root-parallel search over a process pool, for hosts with idle cores (threads cannot help: the GIL).
+    Each root move is a task carrying the position as a snapshot (starting FEN plus move codes, see
+    GameState.getSnapshot); idle workers pull the next move, best-ordered first. Workers share the best
+    root score found so far through a multiprocessing.Value and start every move's window from it, so a
+    good early move prunes the others as in a serial search. Each worker keeps its own Searcher and
+    transposition table between tasks. Call close() when done with the pool.
+
+    Results carry SearchStats summed over the tasks (hashfull stays 0: every worker has its own table),
+    and `info` is called with them after each completed depth, as in Searcher.
+    """
+    def __init__(self, processes=None, timeLimit=None, info=None, **options):
+        self.processes = processes or os.cpu_count() or 1
+        self.timeLimit = timeLimit
+        self.info = info
+        self.sharedAlpha = multiprocessing.Value('d', -INFINITY)
+        self.pool = multiprocessing.Pool(self.processes, _initWorker, (self.sharedAlpha, options))
+
+    def close(self):
+        self.pool.terminate()
+        self.pool.join()
+
+    def searchDepth(self, gs, moves, depth, stats, deadline=None):
+        """
+        Search the root moves (in dispatch order) to `depth` across the pool, stopping at the time.time()
+        `deadline`. The task counters are added to `stats`. Returns (score, pv move_ids, stopped); stopped
+        is True when a worker ran out of time.
+        """
+        self.sharedAlpha.value = -INFINITY
+        snapshot = gs.getSnapshot()
+        tasks = [(type(gs), snapshot, move.move_id, depth, deadline) for move in moves]
+        best = None
+        stopped = False
+        for move_id, score, pv, exact, taskStats, taskStopped in self.pool.imap_unordered(_searchRootMoveTask, tasks):
+            stats.merge(taskStats)
+            stopped = stopped or taskStopped
+            if not taskStopped and (best is None or (exact, score) > (best[2], best[0])):
+                best = (score, pv, exact)
+        if best is None:
+            return -INFINITY, [], stopped
+        return best[0], best[1], stopped
+
+    def completeIteration(self, stats, startTime, depth, score, pv):
+        """Record a completed depth in the stats and report it to the info callback."""
+        stats.time = time.perf_counter() - startTime
+        stats.iterations.append(IterationStats(depth, score, pv, stats.time, stats.nodes))
+        stats.pv = list(pv)
+        if self.info is not None:
+            self.info(stats)
+
+    def search(self, gs, validMoves, depth=DEPTH):
+        """Fixed-depth root-parallel search; returns a SearchResult."""
+        startTime = time.perf_counter()
+        stats = SearchStats()
+        moves = list(validMoves)
+        random.shuffle(moves)  # vary the choice between equally scored moves
+        score, pv, stopped = self.searchDepth(gs, moves, depth, stats)
+        pv = movesFromIds(gs, pv)
+        if pv:
+            self.completeIteration(stats, startTime, depth, score, pv)
+        stats.time = time.perf_counter() - startTime
+        return SearchResult(pv[0] if pv else None, score, depth, stats.nodes, pv, stats.firstMoveCutoffRate,
+                            stats.pruning, stats)
+
+    def iterativeDeepening(self, gs, validMoves, maxDepth=MAX_DEPTH):
+        """Root-parallel iterative deepening under self.timeLimit; returns the deepest completed iteration."""
+        deadline = time.time() + self.timeLimit if self.timeLimit is not None else None
+        startTime = time.perf_counter()
+        stats = SearchStats()
+        moves = list(validMoves)
+        random.shuffle(moves)
+        result = SearchResult(moves[0] if moves else None, 0, 0, 0)
+        for depth in range(1, maxDepth + 1):
+            if deadline is not None and time.time() >= deadline:
+                break
+            score, pv, stopped = self.searchDepth(gs, moves, depth, stats, deadline)
+            if stopped or not pv:
+                break
+            pv = movesFromIds(gs, pv)
+            result = SearchResult(pv[0], score, depth, stats.nodes, pv)
+            self.completeIteration(stats, startTime, depth, score, pv)
+            moves.remove(pv[0])
+            moves.insert(0, pv[0])
+            if abs(score) >= checkMate - depth:
+                break
+        stats.time = time.perf_counter() - startTime
+        result.nodes = stats.nodes
+        result.firstMoveCutoffRate = stats.firstMoveCutoffRate
+        result.pruning = dict(stats.pruning)
+        result.stats = stats
+        return result
+
+
+def findBestMoveParallel(gs, validMoves, depth=DEPTH, processes=None, **options):
+    """Fixed-depth root-parallel search on a temporary pool; keep a ParallelSearcher to reuse one."""
+    searcher = ParallelSearcher(processes, **options)
+    try:
+        return searcher.search(gs, validMoves, depth)
+    finally:
+        searcher.close()
+
+
+# ---------- background search ----------
+def _backgroundWorker(requests, results, cancelled, ponderDeadline, megabytes, reportInfo, options):
+    """
+    Search process: answers (searchId, GameState class, snapshot, timeLimit) requests until sent None,
+    with (searchId, SearchResult, None) messages, preceded by (searchId, None, SearchStats) after each
+    completed depth if reportInfo is set. A timeLimit of None is a ponder search, which runs until
+    cancelled or until ponderDeadline (wall clock, set by a ponder hit) passes.
+    """
+    searcher = Searcher(table=TranspositionTable(megabytes), **options)
+    while True:
+        request = requests.get()
+        if request is None:
+            break
+        searchId, gsClass, snapshot, timeLimit = request
+        if cancelled.value >= searchId:
+            continue
+        gs = gsClass.fromSnapshot(snapshot)
+        searcher.timeLimit = timeLimit
+        if timeLimit is None:
+            searcher.stopCheck = lambda: cancelled.value >= searchId or time.time() >= ponderDeadline.value
+        else:
+            searcher.stopCheck = lambda: cancelled.value >= searchId
+        if reportInfo:
+            # Queue.put pickles later on a feeder thread, while the search keeps updating its stats
+            searcher.info = lambda stats: results.put((searchId, None, copy.deepcopy(stats)))
+        results.put((searchId, searcher.iterativeDeepening(gs, gs.getValidMoves()), None))
+
+
+class BackgroundSearch:
+    """
+    Iterative deepening in a separate process, so the caller (the pygame loop) keeps running while the
+    engine thinks. start() sends the position as a snapshot, poll() returns the SearchResult once it
+    is ready (None until then) and cancel() abandons the search in progress, which stops the worker
+    at its next limit check. One worker process serves every search, keeping its transposition table
+    warm between moves; close() shuts it down.
+
+    ponder(gs), called once the engine's move is played, keeps the worker searching the position after
+    the reply it expects (the second move of its principal variation) while the opponent thinks. If
+    the opponent plays that move, start() adopts the ponder search instead of starting over: its time
+    limit counts from when pondering began, so after a long think the answer is ready at once. On any
+    other move the ponder search is cancelled, and only its table entries carry over.
+
+    `info`, if given, is called from poll() with the SearchStats of each depth the worker completes.
+    """
+    def __init__(self, timeLimit=TIME_LIMIT, tableMegabytes=DEFAULT_MEGABYTES, info=None, **options):
+        self.timeLimit = timeLimit
+        self.info = info
+        self.requests = multiprocessing.Queue()
+        self.results = multiprocessing.Queue()
+        # ids up to this one are cancelled; the worker polls it, so cancelling needs no message round trip
+        self.cancelled = multiprocessing.Value('i', 0)
+        self.ponderDeadline = multiprocessing.Value('d', INFINITY)
+        self.searchId = 0
+        self.thinking = False
+        self.expectedReply = None  # move_id of the reply the last result predicts
+        self.ponderSnapshot = None  # position being pondered, while pondering
+        self.ponderStarted = 0.0
+        self.process = multiprocessing.Process(target=_backgroundWorker, daemon=True,
+                                               args=(self.requests, self.results, self.cancelled,
+                                                     self.ponderDeadline, tableMegabytes, info is not None,
+                                                     options))
+        self.process.start()
+
+    def start(self, gs):
+        """Start searching the current position of gs; any search still running is cancelled."""
+        snapshot = gs.getSnapshot()
+        if self.ponderSnapshot is not None and snapshot == self.ponderSnapshot:
+            # ponder hit: the search already running is the one wanted, now under the time limit
+            self.ponderSnapshot = None
+            self.ponderDeadline.value = self.ponderStarted + self.timeLimit
+            self.thinking = True
+            return
+        self.cancel()
+        self.searchId += 1
+        self.thinking = True
+        self.requests.put((self.searchId, type(gs), snapshot, self.timeLimit))
+
+    def ponder(self, gs):
+        """Search the position after the expected reply in gs until the opponent moves; no-op without one."""
+        if self.expectedReply is None or self.thinking:
+            return
+        if not any(move.move_id == self.expectedReply for move in gs.getValidMoves()):
+            return
+        self.cancel()
+        startFen, moveIds = gs.getSnapshot()
+        self.ponderSnapshot = (startFen, moveIds + (self.expectedReply,))
+        self.ponderStarted = time.time()
+        self.ponderDeadline.value = INFINITY
+        self.searchId += 1
+        self.requests.put((self.searchId, type(gs), self.ponderSnapshot, None))
+
+    def poll(self, gs):
+        """
+        Non-blocking: the SearchResult for gs (the position passed to start) once ready, else None. A
+        result whose move is not legal in gs was searched from another position; it is dropped and
+        thinking is cleared, so the caller starts a new search.
+        """
+        while self.thinking:
+            try:
+                searchId, result, stats = self.results.get_nowait()
+            except queue.Empty:
+                return None
+            if searchId != self.searchId:
+                continue
+            if result is None:
+                self.info(stats)
+                continue
+            self.thinking = False
+            if not resultFits(gs, result):
+                self.expectedReply = None
+                return None
+            self.expectedReply = result.pv[1].move_id if len(result.pv) > 1 else None
+            # rebuild the moves on gs; the unpickled ones are copies made in the worker
+            result.pv = movesFromIds(gs, [move.move_id for move in result.pv])
+            if result.move is not None:
+                result.move = ChessEngine.Move.fromId(result.move.move_id, gs.board)
+            return result
+        return None
+
+    def cancel(self):
+        """Abandon the search in progress, pondering included."""
+        if self.thinking or self.ponderSnapshot is not None:
+            self.cancelled.value = self.searchId
+            self.thinking = False
+            self.ponderSnapshot = None
+
+    def close(self):
+        self.cancel()
+        self.requests.put(None)
+        self.process.join(1)
+        if self.process.is_alive():
+            self.process.terminate()
+
+
+# ---------- time-sliced search ----------
+class SlicedSearch:
+    """
+    Iterative deepening that runs a slice at a time, for machines where a worker process is too
+    expensive: step() advances the search by `sliceTime` seconds of its own and returns, so the caller
+    (one frame of the pygame loop) keeps control. The search runs on a thread that hands control back
+    and forth with step() at its limit checks, so only one of the two ever runs and the slices cost
+    no parallelism. It searches a copy of the position, so the caller may draw gs meanwhile.
+
+    timeLimit counts only the time spent inside slices, so with the same limits and random state the
+    result is the one findBestMoveIterative returns. start/poll/cancel/close and `thinking` match
+    BackgroundSearch, so the two are interchangeable in the main loop.
+    """
+    def __init__(self, timeLimit=TIME_LIMIT, tableMegabytes=DEFAULT_MEGABYTES, sliceTime=SLICE_TIME,
+                 nodeLimit=None, maxDepth=MAX_DEPTH, **options):
+        self.sliceTime = sliceTime
+        self.maxDepth = maxDepth
+        self.searcher = Searcher(timeLimit, nodeLimit, TranspositionTable(tableMegabytes), **options)
+        self.searcher.checkInterval = SLICE_CHECK_NODES
+        self.searcher.stopCheck = self._yield
+        self.thread = None
+        self.thinking = False
+        self.cancelled = False
+        self.result = None
+        self.error = None
+        self.sliceEnd = 0.0
+        self.resume = threading.Event()
+        self.paused = threading.Event()
+
+    def start(self, gs):
+        """Set up a search of the current position of gs; it runs during the following steps."""
+        self.cancel()
+        self.cancelled = False
+        self.result = None
+        self.error = None
+        self.thinking = True
+        position = type(gs).fromSnapshot(gs.getSnapshot())
+        self.thread = threading.Thread(target=self._run, args=(position,), daemon=True)
+
+    def _run(self, position):
+        try:
+            self.result = self.searcher.iterativeDeepening(position, position.getValidMoves(), self.maxDepth)
+        except Exception as error:
+            self.error = error  # re-raised by step() on the caller's thread
+        finally:
+            self.paused.set()  # step() must never be left waiting
+
+    def _yield(self):
+        """Searcher.stopCheck: once the slice is used up, block until the next step() and stop the clock meanwhile."""
+        if time.perf_counter() >= self.sliceEnd and not self.cancelled:
+            pausedAt = time.perf_counter()
+            self.resume.clear()
+            self.paused.set()
+            self.resume.wait()
+            paused = time.perf_counter() - pausedAt
+            self.searcher.startTime += paused
+            if self.searcher.deadline is not None:
+                self.searcher.deadline += paused
+        return self.cancelled
+
+    def step(self, seconds=None):
+        """Run the search for one slice (`seconds`, default sliceTime); the SearchResult once done, else None."""
+        if not self.thinking:
+            return None
+        self.sliceEnd = time.perf_counter() + (self.sliceTime if seconds is None else seconds)
+        self.paused.clear()
+        if self.thread.is_alive():
+            self.resume.set()
+        else:
+            self.thread.start()
+        self.paused.wait()
+        if self.error is not None:
+            self.thread.join()
+            self.thinking = False
+            error, self.error = self.error, None
+            raise error
+        if self.result is None:
+            return None
+        self.thread.join()
+        self.thinking = False
+        return self.result
+
+    def poll(self, gs):
+        """
+        One step; the result's moves are rebuilt on gs, the position passed to start. As with
+        BackgroundSearch.poll, a result not legal in gs is dropped so the caller starts a new search.
+        """
+        result = self.step()
+        if result is not None and not resultFits(gs, result):
+            return None
+        if result is not None and result.pv:
+            result.pv = movesFromIds(gs, [move.move_id for move in result.pv])
+            result.move = result.pv[0]
+        return result
+
+    def ponder(self, gs):
+        """
+        No-op, so the main loop can call it on either search: the sliced search only runs inside
+        step(), and running it during the opponent's turn would take frames from the human.
+        """
+
+    def cancel(self):
+        """Abandon the search in progress; its thread stops at its next limit check."""
+        if self.thinking:
+            self.thinking = False
+            self.cancelled = True
+            if self.thread.is_alive():
+                self.resume.set()
+                self.thread.join()
+
+    def close(self):
+        self.cancel()
+
+
+def pruningSavings(gs, validMoves, depth=4):
+    """
+    Nodes each selective technique saves in a fixed-depth search of this position: the node count with
+    that switch off minus the count with every switch on. Every run starts from the same random state
+    and an empty table so the counts are comparable.
+    """
+    state = random.getstate()
+    nodes = {}
+    for switch in (None, 'nullMove', 'lmr', 'futility', 'reverseFutility'):
+        random.setstate(state)
+        options = {switch: False} if switch else {}
+        nodes[switch] = Searcher(**options).search(gs, validMoves, depth).nodes
+    return {switch: nodes[switch] - nodes[None] for switch in nodes if switch}
+
+
+def findBestMoveMinMax(gs, validMoves, depth=DEPTH):
+    """
+    Root-level function to pick best move (fixed depth), kept for callers that only want the Move.
+    Returns the best Move object (or None if no moves); findBestMoveNegamax returns the whole
+    SearchResult, statistics included.
+    """
+    return findBestMoveNegamax(gs, validMoves, depth).move
 
 
 # optional helper kept for backward compatibility with older code that calls this name
@@ -0,0 +1,86 @@
+"""
+Transposition table - remembers search results by position hash (GameState.zobristKey), so a
+position reached again through a different move order is not searched from scratch.
+
+The table has a fixed number of buckets chosen from a memory cap, and never grows past it. Each
+bucket holds two entries:
+    slot 0 - depth-preferred: replaced only by a search at least as deep, or once its entry is stale
+    slot 1 - always-replace: takes every store the depth-preferred slot turns down
+Entries carry the generation they were written in; newSearch() starts a new generation before
+each move, so entries left over from earlier moves are the first to be evicted.
+"""
+
+# bound types: the stored score is exact, a lower bound (fail high) or an upper bound (fail low)
+EXACT, LOWER, UPPER = 0, 1, 2
+
+# approximate cost of one slot in CPython: the key, score and packed info objects plus three list pointers
+ENTRY_BYTES = 120
+DEFAULT_MEGABYTES = 16
+
+# packed info layout: bits 0-15 move code (0 = none), 16-17 bound, 18-25 generation, 26+ depth
+_MOVE_MASK = 0xFFFF
+_BOUND_SHIFT = 16
+_GENERATION_SHIFT = 18
+_GENERATION_MASK = 0xFF
+_DEPTH_SHIFT = 26
+
+
+class TranspositionTable:
+    def __init__(self, megabytes=DEFAULT_MEGABYTES):
+        # largest power-of-two bucket count that fits the cap, so a key maps to a bucket with a mask
+        buckets = 1
+        while buckets * 4 * ENTRY_BYTES <= megabytes * 1024 * 1024:
+            buckets *= 2
+        self.bucketMask = buckets - 1
+        self.size = buckets * 2
+        self.generation = 0
+        self.clear()
+
+    def clear(self):
+        """Drop every entry and reset the counters."""
+        self.keys = [None] * self.size
+        self.scores = [0] * self.size
+        self.info = [0] * self.size
+        self.probes = self.hits = self.stores = 0
+
+    def newSearch(self):
+        """Start a new generation; entries from older generations become replaceable."""
+        self.generation = (self.generation + 1) & _GENERATION_MASK
+
+    def probe(self, key):
+        """Return (depth, score, bound, move_id or None) stored for key, or None."""
+        self.probes += 1
+        index = (key & self.bucketMask) << 1
+        keys = self.keys
+        if keys[index] != key:
+            index += 1
+            if keys[index] != key:
+                return None
+        self.hits += 1
+        info = self.info[index]
+        move_id = info & _MOVE_MASK
+        return (info >> _DEPTH_SHIFT, self.scores[index], (info >> _BOUND_SHIFT) & 3,
+                move_id if move_id else None)
+
+    def store(self, key, depth, score, bound, move_id=None):
+        """Record a search result; a missing move_id keeps the best move already stored for key."""
+        self.stores += 1
+        index = (key & self.bucketMask) << 1
+        keys = self.keys
+        info = self.info[index]
+        if keys[index] != key and keys[index + 1] == key:
+            index += 1  # refresh the always-replace copy of this position
+        elif keys[index] != key and keys[index] is not None and depth < info >> _DEPTH_SHIFT and \
+                (info >> _GENERATION_SHIFT) & _GENERATION_MASK == self.generation:
+            index += 1  # the depth-preferred slot holds a deeper current entry
+        if not move_id and keys[index] == key:
+            move_id = self.info[index] & _MOVE_MASK
+        keys[index] = key
+        self.scores[index] = score
+        self.info[index] = (move_id or 0) | (bound << _BOUND_SHIFT) | \
+            (self.generation << _GENERATION_SHIFT) | (depth << _DEPTH_SHIFT)
+
+    def hashfull(self):
+        """Share of slots in use, in permille (sampled from the first 1000 slots), as UCI reports it."""
+        sample = self.keys[:1000]
+        return sum(key is not None for key in sample) * 1000 // len(sample)